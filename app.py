@@ -4,11 +4,23 @@ import matplotlib.pyplot as plt
 from matplotlib.patches import FancyBboxPatch
 import plotly.graph_objects as go
 from PIL import Image
+import os
 
-from config import CSV_PATH, REPO, GITHUB_TOKEN
+from config import BULK_INDEX_PATH, TAREFAS_INTERVALO_ATUALIZACAO, COLECAO_TAMANHOS_PAGINA, COLECAO_TAMANHO_PAGINA_PADRAO
 from utils.api import buscar_detalhes_com_lotes, get_usd_to_brl
-from utils.github import salvar_csv_em_github, alterar_csv_em_github, carregar_csv_do_github
-from utils.helpers import gerar_icones, preparar_dataframe, limpar_e_enriquecer_dataframe, autenticar, get_mana_map, extrair_detalhes_cartas
+from utils.historico import valor_ao_longo_do_tempo, maiores_variacoes
+from utils.colecao import carregar_colecao, salvar_edicao, adicionar_cartas
+from utils.armazenamento import get_armazenamento
+from utils.imagens import miniaturas
+from utils.filtros import filtros_na_sidebar
+from utils.busca import sugerir, registrar_colecao
+from utils.dashboard import agregacoes_dashboard, grafico_barras
+from utils.importacao import FORMATOS, chaves_da_colecao
+from utils.pipeline import importar_arquivo
+from utils.tarefas import iniciar_refresh, ultima_tarefa, CONCLUIDA
+from utils.helpers import gerar_icones, preparar_colecao, definir_df_sessao, versao_df_sessao, autenticar, get_mana_map, extrair_detalhes_cartas, somar_quantidades, icone_valor_mana
+
+armazenamento = get_armazenamento()
 
 if "aba_atual" not in st.session_state:
     st.session_state["aba_atual"] = "Coleção"
@@ -41,36 +53,61 @@ with col1:
 
 with col2:
     reprocessar = st.button("Refresh Data", help="Reprocess the data from the CSV file and update the collection.")
+    offline = os.path.exists(BULK_INDEX_PATH) and st.checkbox("Offline (bulk data)", help="Use the local Scryfall bulk-data index instead of the API.")
+    modo_refresh = st.selectbox("Refresh mode", ["Stale only", "Oldest batches", "Full"], help="Stale only: cards whose price is older than the configured age. Oldest batches: the N oldest batches of 75 cards.")
+    max_lotes = st.number_input("Batches", min_value=1, value=5) if modo_refresh == "Oldest batches" else None
 
     if reprocessar:
-        st.session_state.pop("df", None)
-        df = carregar_csv_do_github(REPO, CSV_PATH, GITHUB_TOKEN)
-
-        # Remove duplicatas antes de qualquer processamento
-        df = df.drop_duplicates(subset=["colecao", "numero"], keep="last")
-
-        # Mantém apenas as colunas relevantes
-        df = df.loc[:, ["colecao", "numero", "padrao", "foil", "obs"]]
-
-        # Prepara o DataFrame (se necessário)
-        df = preparar_dataframe(df)
-
-        # Atualiza cotação e busca detalhes
-        cotacao = get_usd_to_brl()
-        identificadores = [{"set": row["colecao"], "collector_number": row["numero"]} for _, row in df.iterrows()]
-        todos_detalhes = buscar_detalhes_com_lotes(identificadores)
-
-        # Extrai os detalhes sem duplicar colunas
-        df_detalhes = extrair_detalhes_cartas(df, todos_detalhes, cotacao)
-
-        # Salva no GitHub e atualiza o estado
-        alterar_csv_em_github(df_detalhes, REPO, CSV_PATH, GITHUB_TOKEN)
-        st.session_state["df"] = df_detalhes
-        st.success("Data updated!")
-
-    else:
-        if "df" not in st.session_state:
-            st.session_state["df"] = carregar_csv_do_github(REPO, CSV_PATH, GITHUB_TOKEN)
+        # Roda em segundo plano (o mesmo que `python -m utils.pipeline refresh`); um por vez no processo
+        tarefa_refresh, iniciada = iniciar_refresh(
+            armazenamento,
+            completo=modo_refresh == "Full",
+            max_lotes=max_lotes,
+            offline=offline
+        )
+        st.session_state["refresh_acompanhado"] = tarefa_refresh.id
+        if not iniciada:
+            st.info("A refresh is already running; following its progress.")
+
+    if "df" not in st.session_state:
+        definir_df_sessao(carregar_colecao(armazenamento))
+
+    def acompanhar_refresh():
+        # Consulta o registro de tarefas; só esta parte da página reroda enquanto o refresh não termina
+        tarefa_refresh = ultima_tarefa("refresh")
+        if tarefa_refresh is None:
+            return
+        if tarefa_refresh.executando:
+            st.session_state["refresh_acompanhado"] = tarefa_refresh.id
+            if tarefa_refresh.total is None:
+                st.progress(0.0, text="Refreshing prices...")
+            else:
+                eta = tarefa_refresh.eta()
+                texto = f"Refreshing prices: batch {tarefa_refresh.lotes_feitos} of {tarefa_refresh.lotes_total}"
+                if eta is not None:
+                    texto += f", about {int(eta // 60)}:{int(eta % 60):02d} left"
+                if tarefa_refresh.falhas:
+                    texto += f", {len(tarefa_refresh.falhas)} failure(s), last: {tarefa_refresh.falhas[-1]}"
+                st.progress(tarefa_refresh.fracao, text=texto)
+        elif st.session_state.get("refresh_acompanhado") == tarefa_refresh.id:
+            # Terminou enquanto esta sessão acompanhava: troca o df e reroda a página inteira
+            st.session_state.pop("refresh_acompanhado")
+            if tarefa_refresh.resultado is not None:
+                definir_df_sessao(tarefa_refresh.resultado)
+            st.session_state["refresh_resultado"] = (tarefa_refresh.estado == CONCLUIDA, tarefa_refresh.mensagem)
+            st.rerun(scope="app")
+
+    # Só consulta periodicamente enquanto há um refresh rodando
+    ultimo_refresh = ultima_tarefa("refresh")
+    refresh_rodando = ultimo_refresh is not None and ultimo_refresh.executando
+    st.fragment(acompanhar_refresh, run_every=TAREFAS_INTERVALO_ATUALIZACAO if refresh_rodando else None)()
+
+    if "refresh_resultado" in st.session_state:
+        sucesso, mensagem = st.session_state.pop("refresh_resultado")
+        if sucesso:
+            st.success(mensagem)
+        else:
+            st.error(f"Refresh failed: {mensagem}")
 
 with col3:
     # Executa autenticação uma vez
@@ -81,13 +118,9 @@ with col3:
 
 if st.session_state["aba_atual"] == "Collection":
     st.header("Collection")
-    df = st.session_state["df"]
-    df, colecao_map = limpar_e_enriquecer_dataframe(df)
+    df, colecao_map = preparar_colecao(st.session_state["df"], versao_df_sessao())
     mana_map = get_mana_map()
 
-    df["quantidade_total"] = df["padrao"] + df["foil"]
-    df["valor_medio_por_carta"] = df["valor_total_brl"] / df["quantidade_total"].replace(0, 1)
-
     # Ordenação
     ordenar_por = st.sidebar.selectbox("Order by", ["Name", "Color", "Value 1 card","Value all cards", "Mana Cost","Collection", "Type", "Rarity", "Card Number", "Quantity Regular", "Quantity Foil","Quantity Total"])
     ordem = st.sidebar.radio("Order", ["Ascending", "Descending"])
@@ -97,7 +130,7 @@ if st.session_state["aba_atual"] == "Collection":
         "Color": "cores",
         "Value 1 card": "valor_medio_por_carta",
         "Value all cards": "valor_total_brl",
-        "Mana Cost": "mana_cost",
+        "Mana Cost": "mana_valor",
         "Collection": "colecao",
         "Type": "tipo",
         "Rarity": "raridade",
@@ -107,66 +140,9 @@ if st.session_state["aba_atual"] == "Collection":
         "Quantity Total": "quantidade_total"
     }[ordenar_por]
 
+    df, assinatura_filtros = filtros_na_sidebar(df, colecao_map, versao_df_sessao())
     df = df.sort_values(by=coluna_ordem, ascending=(ordem == "Ascending"))
 
-    colecao_opcoes = sorted(df["colecao"].unique())
-    colecao_labels = ["All"] + [colecao_map[c]["nome"] for c in colecao_opcoes]
-    colecao_escolhida_label = st.sidebar.multiselect("Collection", colecao_labels, default=["All"])
-
-    if "All" not in colecao_escolhida_label:
-        colecao_escolhida = [
-            c for c in colecao_opcoes if colecao_map[c]["nome"] in colecao_escolhida_label
-        ]
-        df = df[df["colecao"].isin(colecao_escolhida)]
-
-    cores_disponiveis = sorted(set(
-        cor.strip() for lista in df["cores"].dropna().str.split(",") for cor in lista
-    ))
-    opcoes_cores = ["All"] + cores_disponiveis
-    cor_escolhida = st.sidebar.multiselect("Cor", opcoes_cores, default=["All"])
-
-    if "All" not in cor_escolhida:
-        df = df[df["cores"].apply(lambda x: any(c in x for c in cor_escolhida if isinstance(x, str)))]
-
-    # Filtro por nome da carta
-    nome_busca = st.sidebar.text_input("Search by card name")
-    if nome_busca:
-        df = df[df["nome"].str.contains(nome_busca, case=False, na=False)]
-
-    # Filtro por tipo
-    tipos_disponiveis = sorted(df["tipo"].dropna().unique())
-    tipo_escolhido = st.sidebar.multiselect("Card Type", ["All"] + tipos_disponiveis, default=["All"])
-    if "All" not in tipo_escolhido:
-        df = df[df["tipo"].isin(tipo_escolhido)]
-
-    # Filtro por valor
-    valor_maximo = float(df["valor_medio_por_carta"].dropna().max())
-    if pd.isna(valor_maximo) or valor_maximo == 0.0:
-        valor_maximo = 1.0  # fallback seguro
-    valor_min, valor_max = st.sidebar.slider(
-        "Card Value (BRL)",
-        0.0,
-        valor_maximo,
-        (0.0, valor_maximo)
-    )
-
-    # Corrige caso os valores sejam iguais
-    if valor_min == valor_max:
-        valor_max += 1.0
-
-    df = df[(df["valor_medio_por_carta"] >= valor_min) & (df["valor_medio_por_carta"] <= valor_max)]
-
-
-    # Filtro por tipo de posse
-    opcoes_posse = ["All", "Only Regular", "Only Foil", "Both"]
-    posse_escolhida = st.sidebar.selectbox("Face Type", opcoes_posse)
-    if posse_escolhida == "Only Regular":
-        df = df[df["padrao"].astype(int) > 0]
-    elif posse_escolhida == "Only Foil":
-        df = df[df["foil"].astype(int) > 0]
-    elif posse_escolhida == "Both":
-        df = df[(df["padrao"].astype(int) > 0) & (df["foil"].astype(int) > 0)]
-
     col1, col2, col3, col4 = st.columns(4)
 
     total_cartas = df["padrao"].sum() + df["foil"].sum()
@@ -180,128 +156,84 @@ if st.session_state["aba_atual"] == "Collection":
     col4.metric("Total Value (BRL)", f"R$ {valor_total:,.2f}")
     st.markdown("---")
 
+    # Paginação: só as cartas da página visível viram elementos (e imagens) na tela
+    tamanho_pagina = st.sidebar.selectbox(
+        "Cards per page", COLECAO_TAMANHOS_PAGINA,
+        index=COLECAO_TAMANHOS_PAGINA.index(COLECAO_TAMANHO_PAGINA_PADRAO)
+    )
+    total_paginas = max(1, -(-len(df) // tamanho_pagina))
+
+    # Volta para a primeira página sempre que a ordenação, os filtros ou o tamanho mudam
+    assinatura_pagina = (ordenar_por, ordem, assinatura_filtros, tamanho_pagina)
+    if st.session_state.get("colecao_filtros") != assinatura_pagina:
+        st.session_state["colecao_filtros"] = assinatura_pagina
+        st.session_state["colecao_pagina"] = 1
+    st.session_state["colecao_pagina"] = min(st.session_state.get("colecao_pagina", 1), total_paginas)
+
+    def mudar_pagina(passo):
+        st.session_state["colecao_pagina"] = min(max(1, st.session_state["colecao_pagina"] + passo), total_paginas)
+
+    nav1, nav2, nav3 = st.columns([1, 2, 1])
+    with nav1:
+        st.button("Previous", on_click=mudar_pagina, args=(-1,), disabled=st.session_state["colecao_pagina"] <= 1)
+    with nav2:
+        pagina = st.number_input(f"Page (of {total_paginas}, {len(df)} cards)", min_value=1, max_value=total_paginas, key="colecao_pagina")
+    with nav3:
+        st.button("Next", on_click=mudar_pagina, args=(1,), disabled=st.session_state["colecao_pagina"] >= total_paginas)
+
+    df_pagina = df.iloc[(pagina - 1) * tamanho_pagina:pagina * tamanho_pagina]
+
+    # Miniaturas do cache local; a imagem em tamanho normal só é aberta pelo link nos detalhes
+    imagens_pagina = miniaturas(df_pagina["imagem"])
+
     num_colunas = 4
-    for i in range(0, len(df), num_colunas):
-        linha = df.iloc[i:i+num_colunas]
+    for i in range(0, len(df_pagina), num_colunas):
+        linha = df_pagina.iloc[i:i+num_colunas]
         cols = st.columns(len(linha))  # só cria o número necessário de colunas
         for idx, carta in enumerate(linha.itertuples()):
             with cols[idx]:
                 if pd.notna(carta.imagem):
-                    st.image(carta.imagem, use_container_width=True, caption=carta.nome)
+                    st.image(imagens_pagina.get(carta.imagem) or carta.imagem, use_container_width=True, caption=carta.nome)
                 with st.expander("Details", expanded=False):
-                    st.markdown(f"**Type:** {carta.tipo}")
-                    st.markdown("**Mana Cost:** " + gerar_icones(carta.mana_cost, mana_map), unsafe_allow_html=True)
-                    st.markdown("**Colors:** " + gerar_icones(carta.cores, mana_map), unsafe_allow_html=True)
-                    st.markdown(f"**Collection:** {carta.colecao_nome}")
-                    st.markdown(f"**Collection Code:** {carta.colecao}")
-                    st.markdown(f"**Card Number:** {carta.numero}")
-                    st.markdown(f"**Rarity:** {carta.raridade.capitalize()}")
-                    st.markdown(f"**Price (BRL):** R${carta.valor_medio_por_carta}")
-                    st.markdown(f"**Quantity (Regular):** {carta.padrao}")
-                    st.markdown(f"**Quantity (Foil):** {carta.foil}")
-                    tem_segunda_face = "No" if pd.notna(getattr(carta, "nome_2", None)) else "Yes"
-                    st.markdown(f"**Secondary effect or face:** {tem_segunda_face}")
+                    # Um único bloco de markdown por carta em vez de um elemento por linha
+                    tem_segunda_face = "Yes" if pd.notna(getattr(carta, "nome_2", None)) else "No"
+                    links_imagem = [
+                        f"[{rotulo}]({url})"
+                        for rotulo, url in [("Full image", carta.imagem), ("Second face", getattr(carta, "imagem_2", None))]
+                        if isinstance(url, str) and url
+                    ]
+                    st.markdown("  \n".join([
+                        f"**Type:** {carta.tipo}",
+                        "**Mana Cost:** " + gerar_icones(carta.mana_simbolos, mana_map),
+                        "**Colors:** " + gerar_icones(carta.cores, mana_map),
+                        f"**Collection:** {carta.colecao_nome}",
+                        f"**Collection Code:** {carta.colecao}",
+                        f"**Card Number:** {carta.numero}",
+                        f"**Rarity:** {str(carta.raridade).capitalize()}",
+                        f"**Price (BRL):** R${carta.valor_medio_por_carta}",
+                        f"**Quantity (Regular):** {carta.padrao}",
+                        f"**Quantity (Foil):** {carta.foil}",
+                        f"**Secondary effect or face:** {tem_segunda_face}",
+                    ] + ([" | ".join(links_imagem)] if links_imagem else [])), unsafe_allow_html=True)
 
 elif st.session_state["aba_atual"] == "Dashboard":
     st.header("Dashboard")
     
-    df = st.session_state["df"]
-
-    df, colecao_map = limpar_e_enriquecer_dataframe(df)
-    mana_map = get_mana_map()
+    df, colecao_map = preparar_colecao(st.session_state["df"], versao_df_sessao())
 
-    colecao_opcoes = sorted(df["colecao"].unique())
-    colecao_labels = ["All"] + [colecao_map[c]["nome"] for c in colecao_opcoes]
-    colecao_escolhida_label = st.sidebar.multiselect("Collection", colecao_labels, default=["All"])
-
-    if "All" not in colecao_escolhida_label:
-        colecao_escolhida = [
-            c for c in colecao_opcoes if colecao_map[c]["nome"] in colecao_escolhida_label
-        ]
-        df = df[df["colecao"].isin(colecao_escolhida)]
-
-    cores_disponiveis = sorted(set(
-        cor.strip() for lista in df["cores"].dropna().str.split(",") for cor in lista
-    ))
-    opcoes_cores = ["All"] + cores_disponiveis
-    cor_escolhida = st.sidebar.multiselect("Cor", opcoes_cores, default=["All"])
-
-    if "All" not in cor_escolhida:
-        df = df[df["cores"].apply(lambda x: any(c in x for c in cor_escolhida if isinstance(x, str)))]
-
-    # Filtro por nome da carta
-    nome_busca = st.sidebar.text_input("Search by card name")
-    if nome_busca:
-        df = df[df["nome"].str.contains(nome_busca, case=False, na=False)]
-
-    # Filtro por tipo
-    tipos_disponiveis = sorted(df["tipo"].dropna().unique())
-    tipo_escolhido = st.sidebar.multiselect("Card Type", ["All"] + tipos_disponiveis, default=["All"])
-    if "All" not in tipo_escolhido:
-        df = df[df["tipo"].isin(tipo_escolhido)]
-
-    # Filtro por valor
-    valor_maximo = float(df["valor_medio_por_carta"].dropna().max())
-    if pd.isna(valor_maximo) or valor_maximo == 0.0:
-        valor_maximo = 1.0  # fallback seguro
-    valor_min, valor_max = st.sidebar.slider(
-        "Card Value (BRL)",
-        0.0,
-        valor_maximo,
-        (0.0, valor_maximo)
-    )
-
-    # Corrige caso os valores sejam iguais
-    if valor_min == valor_max:
-        valor_max += 1.0
-
-    df = df[(df["valor_medio_por_carta"] >= valor_min) & (df["valor_medio_por_carta"] <= valor_max)]
+    df, assinatura_filtros = filtros_na_sidebar(df, colecao_map, versao_df_sessao())
 
-
-    # Filtro por tipo de posse
-    opcoes_posse = ["All", "Only Regular", "Only Foil", "Both"]
-    posse_escolhida = st.sidebar.selectbox("Face Type", opcoes_posse)
-    if posse_escolhida == "Only Regular":
-        df = df[df["padrao"].astype(int) > 0]
-    elif posse_escolhida == "Only Foil":
-        df = df[df["foil"].astype(int) > 0]
-    elif posse_escolhida == "Both":
-        df = df[(df["padrao"].astype(int) > 0) & (df["foil"].astype(int) > 0)]
+    # Todas as contagens numa passada, guardadas por versão + filtros
+    agregado = agregacoes_dashboard(df, versao_df_sessao(), assinatura_filtros)
 
     col1, col2, col3, col4 = st.columns(4)
 
-    total_cartas = df["padrao"].sum() + df["foil"].sum()
-    total_padroes = df["padrao"].sum()
-    total_foils = df["foil"].sum()
-    valor_total = df["valor_total_brl"].sum()
-
-    col1.metric("Total Cards:", f"{total_cartas:,}")
-    col2.metric("Regular Cards:", f"{total_padroes:,}")
-    col3.metric("Foil Cards:", f"{total_foils:,}")
-    col4.metric("Total Value (BRL)", f"R$ {valor_total:,.2f}")
+    col1.metric("Total Cards:", f"{agregado['total_padrao'] + agregado['total_foil']:,}")
+    col2.metric("Regular Cards:", f"{agregado['total_padrao']:,}")
+    col3.metric("Foil Cards:", f"{agregado['total_foil']:,}")
+    col4.metric("Total Value (BRL)", f"R$ {agregado['valor_total']:,.2f}")
     st.markdown("---")
 
-    # Paleta de cores das manas
-    mana_colors = {
-        "W": "#ffffe0",
-        "U": "#87cefa",
-        "B": "#696969",
-        "R": "#ff7f50",
-        "G": "#7cfc00",
-        "C": "#d3d3d3",
-        "L": "#e6e6fa"
-    }
-
-    # Cartas por cor
-    df["quantidade_total"] = df["padrao"] + df["foil"]
-    df_cores = df.copy()
-    df_cores["cores"] = df_cores["cores"].fillna("").str.split(", ")
-    df_cores = df_cores.explode("cores")
-    cores_contagem = df_cores.groupby("cores")["quantidade_total"].sum().sort_values(ascending=True)
-
-
-    
-
     # Cores suaves
     mana_colors_soft = {
         "W": "#fdfd96",   # amarelo claro
@@ -324,229 +256,13 @@ elif st.session_state["aba_atual"] == "Dashboard":
         "L": "https://svgs.scryfall.io/card-symbols/L.svg"
     }
 
-
-    fig1 = go.Figure()
-
-    # Adiciona barras e ícones
-    for cor, valor in cores_contagem.items():
-        fig1.add_trace(go.Bar(
-            x=[valor],
-            y=[cor],
-            orientation='h',
-            marker=dict(
-                color=mana_colors_soft.get(cor, "#999999"),
-                line=dict(width=0)
-            ),
-            text=str(valor),
-            textposition='outside', 
-            cliponaxis=False,
-            insidetextanchor='end',
-            hoverinfo='none',
-            textfont=dict(size=16,color="white")
-        ))
-
-        # Adiciona ícone com altura proporcional à barra
-        fig1.add_layout_image(
-            dict(
-                source=mana_icons.get(cor),
-                xref="paper",
-                yref="y",
-                x=-0.08,  # ⬅ mais à esquerda
-                y=cor,
-                sizex=0.06,
-                sizey=1.0,  # ⬅ altura igual à faixa da barra
-                xanchor="left",
-                yanchor="middle",
-                layer="above"
-            )
-        )
-
-    # Layout do gráfico
-    fig1.update_layout(
-        title_text='Card quantity by mana color',
-        title_x=0.0,
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='white'),
-        xaxis=dict(
-            visible=False,
-            showticklabels=False,
-            showgrid=False,
-            ticks=""
-        ),
-        yaxis=dict(
-            showticklabels=False,  # ⬅ remove os rótulos de texto
-            title=None             # ⬅ remove o nome do eixo
-        ),
-        margin=dict(l=100, r=80, t=40, b=30)  # ⬅ mais espaço à esquerda
-    )
-
-    fig1.update_layout(showlegend=False)
-
-
-
-    # Cartas por coleção
-    colecao_contagem = df.groupby("colecao_nome")["quantidade_total"].sum().sort_values(ascending=True)
-
-    # Criação do gráfico
-    fig2 = go.Figure()
-
-    for colecao_nome, quantidade_total in colecao_contagem.items():
-        fig2.add_trace(go.Bar(
-            x=[quantidade_total],
-            y=[str(colecao_nome)],
-            orientation='h',
-            marker=dict(color="#D3D3D3", line=dict(width=0)),
-            text=str(quantidade_total),
-            textposition='outside',
-            cliponaxis=False,
-            insidetextanchor='end',
-            hoverinfo='none',
-            textfont=dict(size=16,color="white")
-        ))
-
-    # Estilo do gráfico
-    fig2.update_layout(
-        title_text='Collection distribution',
-        height=3000,
-        title_x=0.0,
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='white'),
-        xaxis=dict(
-            visible=False,
-            showticklabels=False,
-            showgrid=False,
-            ticks=""
-        ),
-        yaxis=dict(showticklabels=True, title=None),
-        margin=dict(l=100, r=80, t=40, b=30),
-        showlegend=False
-    )
-
-    import re
-
-    # Função para calcular o custo total de mana
-    def calcular_mana_total(mana_cost):
-        if pd.isna(mana_cost):
-            return 0
-        partes = re.findall(r'\d+|[WUBRGCL]', mana_cost)
-        total = 0
-        for p in partes:
-            if p.isdigit():
-                total += int(p)
-            else:
-                total += 1
-        return total
-
-    # Aplica a função e agrupa
-    df["mana_total"] = df["mana_cost"].apply(calcular_mana_total)
-    mana_total_contagem = df.groupby("mana_total")["quantidade_total"].sum().sort_index()
-
     # Dicionário de ícones de custo de mana da Scryfall
-    mana_cost_icons = {
-        i: f"https://svgs.scryfall.io/card-symbols/{i}.svg" for i in mana_total_contagem.index
-    }
-
-    # Criação do gráfico
-    fig3 = go.Figure()
-
-    for custo, quantidade in mana_total_contagem.items():
-        fig3.add_trace(go.Bar(
-            x=[quantidade],
-            y=[str(custo)],
-            orientation='h',
-            marker=dict(color="#D3D3D3", line=dict(width=0)),
-            text=str(quantidade),
-            textposition='outside',
-            cliponaxis=False,
-            insidetextanchor='end',
-            hoverinfo='none',
-            textfont=dict(size=16,color="white")
-        ))
-
-        # Ícone no lugar do rótulo
-        fig3.add_layout_image(
-            dict(
-                source=mana_cost_icons.get(custo),
-                xref="paper",
-                yref="y",
-                x=-0.08,
-                y=str(custo),
-                sizex=0.06,
-                sizey=1.0,
-                xanchor="left",
-                yanchor="middle",
-                layer="above"
-            )
-        )
-
-    # Estilo do gráfico
-    fig3.update_layout(
-        title_text='Mana cost distribution',
-        title_x=0.0,
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='white'),
-        xaxis=dict(
-            visible=False,
-            showticklabels=False,
-            showgrid=False,
-            ticks=""
-        ),
-        yaxis=dict(showticklabels=False, title=None),
-        margin=dict(l=100, r=80, t=40, b=30),
-        showlegend=False
-    )
-
-    # Cartas por tipo
-    def extrair_antes_do_traco(texto):
-        if pd.isna(texto):
-            return ""
-        # Tenta dividir por em dash (—) ou en dash (–)
-        partes = re.split(r"—|–", texto)
-        return partes[0].strip() if partes else texto.strip()
-
-    df["tipo_sem_traco"] = df["tipo"].apply(extrair_antes_do_traco)
-    tipo_contagem = df.groupby("tipo_sem_traco")["quantidade_total"].sum().sort_values(ascending=True)
-
-
-
-    # Criação do gráfico
-    fig4 = go.Figure()
-
-    for tipo_sem_traco, quantidade_total in tipo_contagem.items():
-        fig4.add_trace(go.Bar(
-            x=[quantidade_total],
-            y=[str(tipo_sem_traco)],
-            orientation='h',
-            marker=dict(color="#D3D3D3", line=dict(width=0)),
-            text=str(quantidade_total),
-            textposition='outside',
-            cliponaxis=False,
-            insidetextanchor='end',
-            hoverinfo='none',
-            textfont=dict(size=16,color="white")
-        ))
+    mana_cost_icons = {str(i): icone_valor_mana(i) for i in agregado["mana_valor"].index}
 
-    # Estilo do gráfico
-    fig4.update_layout(
-        title_text='Card type distribution',
-        title_x=0.0,
-        height=1000,
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='white'),
-        xaxis=dict(
-            visible=False,
-            showticklabels=False,
-            showgrid=False,
-            ticks="",
-        ),
-        yaxis=dict(showticklabels=True, title=None),
-        margin=dict(l=100, r=80, t=40, b=30),
-        showlegend=False
-    )
+    fig1 = grafico_barras(agregado["cores"], 'Card quantity by mana color', cores=mana_colors_soft, icones=mana_icons)
+    fig2 = grafico_barras(agregado["colecoes"], 'Collection distribution', altura_barra=24)
+    fig3 = grafico_barras(agregado["mana_valor"], 'Mana cost distribution', icones=mana_cost_icons)
+    fig4 = grafico_barras(agregado["tipos"], 'Card type distribution', altura_barra=24)
 
     col1, col2 = st.columns([1, 1])  # proporções iguais
 
@@ -558,6 +274,52 @@ elif st.session_state["aba_atual"] == "Dashboard":
         st.plotly_chart(fig3, use_container_width=True)
         st.plotly_chart(fig4, use_container_width=True)
 
+    # Histórico de preços
+    st.markdown("---")
+    evolucao = valor_ao_longo_do_tempo()
+
+    if len(evolucao) < 2:
+        st.info("Price history will appear here after a few daily refreshes.")
+    else:
+        fig5 = go.Figure(go.Scatter(
+            x=evolucao.index,
+            y=evolucao["valor_total_brl"],
+            mode="lines+markers",
+            line=dict(color="#D3D3D3"),
+            hovertemplate="%{x|%Y-%m-%d}<br>R$ %{y:,.2f}<extra></extra>"
+        ))
+        fig5.update_layout(
+            title_text='Collection value over time (BRL)',
+            title_x=0.0,
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='white'),
+            xaxis=dict(showgrid=False),
+            yaxis=dict(showgrid=False, title=None),
+            margin=dict(l=100, r=80, t=40, b=30),
+            showlegend=False
+        )
+        st.plotly_chart(fig5, use_container_width=True)
+
+        dias_variacao = st.selectbox("Price movers period (days)", [7, 30, 90, 365], index=1)
+        variacoes = maiores_variacoes(dias=dias_variacao, n=20)
+        nomes = df[["colecao", "numero", "nome"]].astype({"colecao": str, "numero": str})
+        variacoes = variacoes.merge(nomes, on=["colecao", "numero"], how="left")
+        st.dataframe(
+            variacoes[["nome", "colecao", "numero", "preco_antes", "preco_agora", "variacao", "variacao_pct"]],
+            column_config={
+                "nome": "Card",
+                "colecao": "Collection",
+                "numero": "Number",
+                "preco_antes": st.column_config.NumberColumn("Before (BRL)", format="%.2f"),
+                "preco_agora": st.column_config.NumberColumn("Now (BRL)", format="%.2f"),
+                "variacao": st.column_config.NumberColumn("Change (BRL)", format="%.2f"),
+                "variacao_pct": st.column_config.NumberColumn("Change (%)", format="percent"),
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+
 elif st.session_state["aba_atual"] == "Add Card":
     st.header("Add card manually or by code")
     df_existente = st.session_state["df"]
@@ -569,8 +331,26 @@ elif st.session_state["aba_atual"] == "Add Card":
     modo = st.radio("Mode", ["Manual", "Search by code"])
 
     if modo == "Search by code":
-        codigo_colecao_add = st.text_input("Collection code")
-        numero_carta_add = st.text_input("Card number")
+        # Autocompletar pelo nome: a impressão escolhida preenche o código da coleção e o número
+        nome_sugestao = st.text_input("Card name (autocomplete)")
+        codigo_sugerido, numero_sugerido = "", ""
+        if nome_sugestao:
+            registrar_colecao(df_existente, versao_df_sessao())
+            opcoes_impressao = [
+                (sugestao["nome"], colecao, numero)
+                for sugestao in sugerir(nome_sugestao)
+                for colecao, numero in sugestao["impressoes"]
+            ]
+            if opcoes_impressao:
+                _, codigo_sugerido, numero_sugerido = st.selectbox(
+                    "Suggestions", opcoes_impressao,
+                    format_func=lambda opcao: f"{opcao[0]} ({opcao[1].upper()} #{opcao[2]})"
+                )
+            else:
+                st.info("No card found with that name.")
+
+        codigo_colecao_add = st.text_input("Collection code", value=codigo_sugerido)
+        numero_carta_add = st.text_input("Card number", value=numero_sugerido)
         padrao_add = st.number_input("Regular quantity", min_value=0)
         foil_add = st.number_input("Foil quantity", min_value=0)
 
@@ -631,12 +411,12 @@ elif st.session_state["aba_atual"] == "Add Card":
                         st.warning("This card already is in the collection.")
                     else:
                         df_add = pd.concat([df_existente, nova], ignore_index=True)
-                        sucesso = salvar_csv_em_github(nova, REPO, CSV_PATH, GITHUB_TOKEN)
+                        sucesso, mensagem = adicionar_cartas(nova, armazenamento)
                         if sucesso:
-                            st.session_state["df"] = df_add
+                            definir_df_sessao(df_add)
                             st.success("Card added!")
                         else:
-                            st.error("Error saving in GitHub.")
+                            st.error(f"Error saving in GitHub: {mensagem}")
                 else:
                     st.error("Card not found in API.")
     else:
@@ -678,51 +458,45 @@ elif st.session_state["aba_atual"] == "Add Card":
                     st.warning("This card already is in the collection.")
                 else:
                     df_form = pd.concat([df_existente, nova_carta], ignore_index=True)
-                    sucesso, mensagem = salvar_csv_em_github(nova_carta, REPO, CSV_PATH, GITHUB_TOKEN)
+                    sucesso, mensagem = adicionar_cartas(nova_carta, armazenamento)
                     if sucesso:
-                        st.session_state["df"] = df_form
+                        definir_df_sessao(df_form)
                         st.success("Card added!")
                     else:
                         st.error(f"Error saving in GitHub: {mensagem}")
 
 elif st.session_state["aba_atual"] == "Import File":
-    st.header("Import cards from Excel file")
+    st.header("Import cards from a file")
 
     if acesso_restrito:
         st.warning("Enter the password to access this page.")
         st.stop()
 
-    arquivo = st.file_uploader("Select the Excel file", type=["xlsx"])
+    arquivo = st.file_uploader(
+        "Select the file (Excel, CSV or a decklist like \"4 Lightning Bolt (2XM) 129\")", type=FORMATOS
+    )
     executar_importacao = st.button("Import")
 
     if executar_importacao and arquivo:
-        df_file = pd.read_excel(arquivo)
-        df_file = df_file.dropna(subset=["colecao", "numero"])
-        df_file["colecao"] = df_file["colecao"].astype(str).str.lower()
-        df_file["numero"] = df_file["numero"].astype(str)
-        df_file["padrao"] = df_file.get("padrao", 1)
-        df_file["foil"] = df_file.get("foil", 0)
-
-        df_file = df_file.groupby(["colecao", "numero"], as_index=False).agg({
-            "padrao": "sum",
-            "foil": "sum",
-            **{col: "first" for col in df_file.columns if col not in ["colecao", "numero", "padrao", "foil"]}
-        })
-
-        cotacao_file = get_usd_to_brl()
-        identificadore2 = [{"set": row["colecao"], "collector_number": row["numero"]} for _, row in df_file.iterrows()]
-        todos_detalhes2 = buscar_detalhes_com_lotes(identificadore2)
-
-        df_manager = extrair_detalhes_cartas(df_file, todos_detalhes2, cotacao_file)
-
-        df_final = pd.concat([df_file, df_manager], axis=1)
-        sucesso, mensagem = salvar_csv_em_github(df_manager, REPO, CSV_PATH, GITHUB_TOKEN)
+        # Lido em blocos; cada bloco é buscado na API enquanto o próximo é lido, e gravado em seguida.
+        # Cartas já na coleção não são buscadas: só somam as quantidades.
+        progresso = st.empty()
+        sucesso, mensagem, _ = importar_arquivo(
+            arquivo,
+            arquivo.name,
+            armazenamento,
+            conhecidas=chaves_da_colecao(st.session_state["df"]),
+            offline=offline,
+            ao_progredir=lambda linhas, importadas: progresso.text(f"{linhas:,} rows read, {importadas:,} cards imported..."),
+            # Cada bloco gravado já entra no df da sessão
+            ao_gravar=lambda bloco: definir_df_sessao(somar_quantidades(st.session_state["df"], bloco))
+        )
+        progresso.empty()
 
         if sucesso:
-            st.session_state["df"] = df_final
-            st.success("Cards add!")
+            st.success(f"Cards add! {mensagem}")
         else:
-            st.error(f"Error saving in GitHub: {mensagem}")
+            st.error(f"Import failed: {mensagem}")
 
 elif st.session_state["aba_atual"] == "Card Manager":
         st.header("Card Manager")
@@ -732,7 +506,7 @@ elif st.session_state["aba_atual"] == "Card Manager":
             st.stop()
 
         if "df" not in st.session_state:
-            st.session_state["df"] = carregar_csv_do_github(REPO, CSV_PATH, GITHUB_TOKEN)
+            definir_df_sessao(carregar_colecao(armazenamento))
 
         df_manager = st.session_state["df"]
 
@@ -750,9 +524,9 @@ elif st.session_state["aba_atual"] == "Card Manager":
         )
         # Botão de salvar
         if st.button("Save"):
-            sucesso, mensagem = alterar_csv_em_github(df_editado, REPO, CSV_PATH, GITHUB_TOKEN)
+            sucesso, mensagem, df_salvo = salvar_edicao(df_manager, df_editado, armazenamento)
             if sucesso:
-                st.session_state["df"] = df_editado
+                definir_df_sessao(df_salvo)
                 st.success("Changes saved!")
             else:
-                st.error(f"Error saving in GitHub: {mensagem}")
\ No newline at end of file
+                st.error(f"Error saving in GitHub: {mensagem}")
\ No newline at end of file
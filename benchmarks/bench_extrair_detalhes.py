@@ -0,0 +1,69 @@
+# Compara a versão antiga (apply por coluna) com a junção vetorizada de extrair_detalhes_cartas
+# Uso: python -m benchmarks.bench_extrair_detalhes
+import time
+import pandas as pd
+from utils.helpers import extrair_detalhes_cartas
+
+def extrair_detalhes_cartas_antigo(df, todos_detalhes, cotacao):
+    detalhes_dict = {}
+
+    for carta in todos_detalhes:
+        preco_usd = float(carta.get("prices", {}).get("usd") or 0)
+        preco_foil = float(carta.get("prices", {}).get("usd_foil") or 0)
+        faces = carta.get("card_faces", [])
+        face1 = faces[0] if faces else carta
+        face2 = faces[1] if len(faces) > 1 else {}
+
+        detalhes_dict[(carta["set"], carta["collector_number"])] = {
+            "nome": face1.get("name"),
+            "mana_cost": face1.get("mana_cost"),
+            "cores": ", ".join(face1.get("colors", [])),
+            "imagem": face1.get("image_uris", {}).get("normal") or carta.get("image_uris", {}).get("normal"),
+            "nome_2": face2.get("name"),
+            "imagem_2": face2.get("image_uris", {}).get("normal"),
+            "colecao_nome": carta.get("set_name"),
+            "icone_colecao": carta.get("set_icon_svg_uri"),
+            "raridade": carta.get("rarity"),
+            "tipo": carta.get("type_line"),
+            "preco_brl": round(preco_usd * cotacao, 2),
+            "preco_brl_foil": round(preco_foil * cotacao, 2)
+        }
+
+    for coluna in list(detalhes_dict.values())[0].keys():
+        df[coluna] = df.apply(lambda linha: detalhes_dict.get((linha["colecao"], linha["numero"]), {}).get(coluna), axis=1)
+
+    return df
+
+def gerar_dados(n):
+    cartas = [{
+        "set": f"s{i % 300}",
+        "collector_number": str(i),
+        "name": f"Carta {i}",
+        "mana_cost": "{2}{G}",
+        "colors": ["G"],
+        "image_uris": {"normal": f"https://cards.scryfall.io/normal/{i}.jpg"},
+        "set_name": f"Set {i % 300}",
+        "rarity": "common",
+        "type_line": "Creature — Elf",
+        "prices": {"usd": "0.25", "usd_foil": "1.10"}
+    } for i in range(n)]
+    df = pd.DataFrame({
+        "colecao": [c["set"] for c in cartas],
+        "numero": [c["collector_number"] for c in cartas],
+        "padrao": 1,
+        "foil": 0,
+        "obs": None
+    })
+    return df, cartas
+
+def medir(funcao, df, cartas):
+    inicio = time.perf_counter()
+    funcao(df.copy(), cartas, 5.0)
+    return time.perf_counter() - inicio
+
+if __name__ == "__main__":
+    for n in (10_000, 100_000):
+        df, cartas = gerar_dados(n)
+        antigo = medir(extrair_detalhes_cartas_antigo, df, cartas)
+        novo = medir(extrair_detalhes_cartas, df, cartas)
+        print(f"{n:>7} linhas | apply: {antigo:7.2f}s | merge: {novo:6.3f}s | {antigo / novo:5.1f}x")
@@ -1,6 +1,51 @@
+import os
 import streamlit as st
 
 CSV_PATH = "cartas_magic_detalhadas.csv"
 REPO = "a-ruivo/mtg-cards-price-via-scryfall-api"
-GITHUB_TOKEN = st.secrets["github_token"]
 TTL = 86400  # 24 horas
+CACHE_PATH = "scryfall_cache.db"
+SCRYFALL_REQUISICOES_POR_SEGUNDO = 10  # limite publicado pela Scryfall (50-100 ms entre requisições)
+SCRYFALL_LOTES_SIMULTANEOS = 4
+BULK_INDEX_PATH = "scryfall_bulk.db"
+REFRESH_IDADE_MAXIMA = TTL  # preços mais velhos que isso são buscados de novo no "Refresh Data"
+REFRESH_LOTES_POR_SALVAMENTO = 10
+METADADOS_PATH = "cartas_metadados.csv"  # dados estáticos de cada carta
+PRECOS_PATH = "cartas_precos.csv"  # quantidades e preços, reescritos a cada atualização
+DIARIO_PATH = "cartas_diario.csv"  # adições e mudanças de quantidade ainda não compactadas
+DIARIO_LIMITE_COMPACTACAO = 200  # entradas no diário antes de dobrá-lo no snapshot
+FILA_LIMITE = 50  # alterações pendentes que disparam uma gravação imediata
+FILA_INTERVALO = 10  # segundos até gravar as alterações pendentes
+GRAVACAO_TENTATIVAS = 5  # releituras + mesclagem após conflito de versão
+COLECAO_TAMANHOS_PAGINA = [20, 40, 80, 160]  # opções de cartas por página na grade da coleção
+COLECAO_TAMANHO_PAGINA_PADRAO = 40
+IMAGENS_CACHE_PATH = "imagens_cache"  # miniaturas WebP das cartas
+IMAGENS_LARGURA_MINIATURA = 260  # px; a grade mostra 4 cartas por linha
+IMAGENS_QUALIDADE_WEBP = 80
+IMAGENS_CACHE_LIMITE_MB = 200  # acima disso, as miniaturas usadas há mais tempo são removidas
+IMAGENS_DOWNLOADS_SIMULTANEOS = 8
+IMAGENS_TIMEOUT = 5  # segundos; se o CDN não responder, a grade usa a URL original
+IMAGENS_ESPERA_APOS_FALHA = 300  # segundos antes de tentar de novo uma imagem que falhou
+BUSCA_SIMILARIDADE_MINIMA = 0.7  # fração dos trigramas da consulta acima da qual o nome entra sem conferir a grafia
+BUSCA_ERROS_TOLERADOS = 1  # erros de digitação (troca, falta, sobra ou inversão de letras) aceitos na busca
+BUSCA_SUGESTOES = 10  # sugestões do autocompletar no "Add Card"
+IMPORTACAO_TAMANHO_BLOCO = 1500  # linhas lidas e buscadas por vez na importação (20 lotes da API)
+IMPORTACAO_PROGRESSO_PATH = "importacao_progresso.json"  # permite retomar uma importação interrompida
+SNAPSHOT_PATH = "cartas_colecao.parquet"  # cópia local tipada da coleção, preferida na leitura
+HISTORICO_PATH = "historico_precos"  # snapshots diários de preço em Parquet
+GITHUB_FRAGMENTOS = 16  # cada tabela no GitHub vira uma pasta com esse número de CSVs (por hash do set)
+GITHUB_DOWNLOADS_SIMULTANEOS = 8
+GITHUB_CACHE_PATH = "github_cache"  # ETags e DataFrames já lidos do GitHub
+GITHUB_CACHE_LIMITE_MB = 50  # acima disso, os DataFrames em cache usados há mais tempo são removidos
+TAREFAS_INTERVALO_ATUALIZACAO = 2  # segundos entre as consultas da página ao refresh em segundo plano
+TAREFAS_HISTORICO = 10  # tarefas terminadas mantidas no registro
+
+# Onde a coleção é guardada: "github", "local", "sqlite" ou "parquet"
+ARMAZENAMENTO = os.environ.get("MTG_ARMAZENAMENTO", "github")
+ARMAZENAMENTO_LOCAL_PATH = os.environ.get("MTG_ARMAZENAMENTO_LOCAL_PATH", "dados")
+ARMAZENAMENTO_SQLITE_PATH = os.environ.get("MTG_ARMAZENAMENTO_SQLITE_PATH", "colecao.db")
+ARMAZENAMENTO_PARQUET_PATH = os.environ.get("MTG_ARMAZENAMENTO_PARQUET_PATH", "dados_parquet")
+
+def get_github_token():
+    # Só lido quando o backend GitHub é usado; a variável de ambiente permite rodar fora do Streamlit
+    return os.environ.get("GITHUB_TOKEN") or st.secrets["github_token"]
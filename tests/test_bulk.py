@@ -0,0 +1,53 @@
+import json
+import os
+import pytest
+import utils.api as api
+from utils.bulk import iterar_cartas_bulk, construir_indice_bulk, buscar_no_indice_bulk
+
+DUMP = os.path.join(os.path.dirname(__file__), "dados", "bulk_pequeno.json")
+
+@pytest.fixture
+def indice(tmp_path):
+    caminho = str(tmp_path / "bulk.db")
+    construir_indice_bulk(DUMP, caminho, tamanho_lote=2)
+    return caminho
+
+@pytest.mark.parametrize("tamanho_bloco", [1, 7, 64, 1 << 20])
+def test_iterar_cartas_bulk_com_objetos_entre_blocos(tamanho_bloco):
+    with open(DUMP, encoding="utf-8") as f:
+        esperado = json.load(f)
+
+    assert list(iterar_cartas_bulk(DUMP, tamanho_bloco=tamanho_bloco)) == esperado
+
+def test_construir_e_buscar_no_indice(indice):
+    encontradas, faltantes = buscar_no_indice_bulk([
+        {"set": "2XM", "collector_number": "129"},
+        {"set": "isd", "collector_number": 51},
+        {"set": "abc", "collector_number": "1"},
+    ], indice)
+
+    assert [carta["name"] for carta in encontradas] == ["Lightning Bolt", "Delver of Secrets // Insectile Aberration"]
+    assert faltantes == [{"set": "abc", "collector_number": "1"}]
+    # Só os campos que o app usa ficam no índice
+    assert "oracle_text" not in encontradas[0]
+    assert encontradas[0]["prices"] == {"usd": "1.50", "usd_foil": "3.25"}
+    assert [face["name"] for face in encontradas[1]["card_faces"]] == ["Delver of Secrets", "Insectile Aberration"]
+
+def test_construir_indice_de_novo_substitui_o_anterior(indice):
+    assert construir_indice_bulk(DUMP, indice) == 4
+    encontradas, _ = buscar_no_indice_bulk([{"set": "xln", "collector_number": "65"}], indice)
+    assert len(encontradas) == 1
+
+def test_buscar_detalhes_offline_usa_o_indice(indice, monkeypatch):
+    monkeypatch.setattr(api, "BULK_INDEX_PATH", indice)
+    monkeypatch.setattr(api, "get_sessao", lambda: pytest.fail("o modo offline não pode chamar a API"))
+    falhas = []
+
+    detalhes = api.buscar_detalhes_com_lotes(
+        [{"set": "c21", "collector_number": "263"}, {"set": "xyz", "collector_number": "9"}],
+        mostrar_progresso=False, offline=True, ao_falhar=lambda lote, motivo: falhas.append(motivo)
+    )
+
+    # A carta fora do índice só não vem; não é um lote que falhou
+    assert [carta["name"] for carta in detalhes] == ["Sol Ring"]
+    assert falhas == []
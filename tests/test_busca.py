@@ -0,0 +1,33 @@
+import pytest
+from utils.busca import IndiceNomes
+
+@pytest.fixture
+def indice():
+    indice = IndiceNomes()
+    indice.adicionar(["Lightning Bolt", "Lightning Strike", "Stun", "Sunforger", "Path of Peace", "Genju of the Falls", "Opt"])
+    return indice
+
+def nomes(indice, consulta):
+    return [indice.exibicao[id_nome] for id_nome, _ in indice.buscar(consulta)]
+
+def test_troca_de_letra(indice):
+    assert nomes(indice, "sunforgar") == ["Sunforger"]
+    assert nomes(indice, "stan") == ["Stun"]
+
+def test_inversao_de_letras(indice):
+    assert nomes(indice, "lihgtning")[:2] == ["Lightning Bolt", "Lightning Strike"]
+    assert "Sunforger" in nomes(indice, "snuforger")
+
+def test_prefixo(indice):
+    assert nomes(indice, "sunf") == ["Sunforger"]
+    assert nomes(indice, "l") == ["Lightning Bolt", "Lightning Strike"]
+
+def test_varias_palavras(indice):
+    assert nomes(indice, "lightning bo")[0] == "Lightning Bolt"
+    assert nomes(indice, "lightnig bolt")[0] == "Lightning Bolt"
+    assert nomes(indice, "path of peac") == ["Path of Peace"]
+    assert nomes(indice, "genju falls") == ["Genju of the Falls"]
+
+def test_consulta_curta_nao_aceita_erro(indice):
+    assert nomes(indice, "opt") == ["Opt"]
+    assert nomes(indice, "otp") == []
@@ -0,0 +1,17 @@
+import time
+from utils.cache import gravar_cache, ler_cache, limpar_cache_expirado, _conectar
+
+def test_limpar_cache_expirado_so_remove_as_velhas(tmp_path):
+    caminho = str(tmp_path / "cache.db")
+    gravar_cache([{"set": "abc", "collector_number": "1"}, {"set": "abc", "collector_number": "2"}], caminho)
+    with _conectar(caminho) as conn:
+        conn.execute("UPDATE cartas SET buscado_em = ? WHERE numero = '1'", (time.time() - 7200,))
+    conn.close()
+
+    assert limpar_cache_expirado(ttl=3600, caminho=caminho) == 1
+
+    encontradas, faltantes = ler_cache(
+        [{"set": "abc", "collector_number": "1"}, {"set": "ABC", "collector_number": "2"}], ttl=86400, caminho=caminho
+    )
+    assert encontradas == [{"set": "abc", "collector_number": "2"}]
+    assert faltantes == [{"set": "abc", "collector_number": "1"}]
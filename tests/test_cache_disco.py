@@ -0,0 +1,22 @@
+import os
+from utils.cache_disco import limitar_pasta
+
+def test_remove_os_usados_ha_mais_tempo_ate_caber(tmp_path):
+    for i, nome in enumerate(["a.pkl", "b.pkl", "c.pkl", "d.pkl"]):
+        caminho = tmp_path / nome
+        caminho.write_bytes(b"x" * 100)
+        os.utime(caminho, (1000 + i, 1000 + i))
+    (tmp_path / "outro.json").write_bytes(b"x" * 500)
+    os.utime(tmp_path / "a.pkl")  # lido agora: passa a ser o mais recente
+
+    restante = limitar_pasta(str(tmp_path), 250, ".pkl")
+
+    assert restante == 200
+    assert sorted(os.listdir(tmp_path)) == ["a.pkl", "d.pkl", "outro.json"]
+
+def test_abaixo_do_limite_nada_sai(tmp_path):
+    (tmp_path / "a.pkl").write_bytes(b"x" * 100)
+
+    assert limitar_pasta(str(tmp_path), 250, ".pkl") == 100
+    assert limitar_pasta(str(tmp_path / "nao_existe"), 250, ".pkl") == 0
+    assert os.listdir(tmp_path) == ["a.pkl"]
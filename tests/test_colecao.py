@@ -0,0 +1,220 @@
+import pandas as pd
+import pytest
+import utils.colecao as colecao
+from config import DIARIO_PATH, PRECOS_PATH
+from utils.armazenamento import ArmazenamentoLocal
+
+@pytest.fixture
+def armazenamento(tmp_path, monkeypatch):
+    monkeypatch.setattr(colecao, "SNAPSHOT_PATH", str(tmp_path / "snapshot.parquet"))
+    return ArmazenamentoLocal(str(tmp_path / "dados"))
+
+@pytest.fixture
+def diario_sem_limpeza(monkeypatch):
+    # Simula a falha da segunda escrita da compactação (remover as entradas do diário)
+    gravar = ArmazenamentoLocal.alterar
+    estado = {"falhar": True}
+
+    def alterar(self, df, path, versao_esperada=None):
+        existente = self.versao(path) is not None
+        if path == DIARIO_PATH and estado["falhar"] and existente and len(df) < len(self.carregar(path)):
+            return False, "falha simulada"
+        return gravar(self, df, path, versao_esperada)
+
+    monkeypatch.setattr(ArmazenamentoLocal, "alterar", alterar)
+    return estado
+
+def carta(numero, padrao, foil=0):
+    return pd.DataFrame([{"colecao": "abc", "numero": numero, "nome": f"Carta {numero}", "padrao": padrao, "foil": foil}])
+
+def quantidade(df, numero):
+    return int(df.loc[df["numero"] == numero, "padrao"].iloc[0])
+
+def test_aplicar_diario_ignora_entradas_ja_compactadas():
+    df = pd.DataFrame({
+        "colecao": ["abc"], "numero": ["1"], "padrao": [2], "foil": [0],
+        colecao.COLUNA_DIARIO_APLICADO: ["e1"],
+    })
+    diario = pd.DataFrame({
+        "id": ["e1", "e2"], "registrado_em": ["2024-01-01", "2024-01-02"], "operacao": ["adicionar", "adicionar"],
+        "colecao": ["abc", "abc"], "numero": ["1", "1"], "padrao": [2, 1], "foil": [0, 0],
+    })
+
+    resultado = colecao.aplicar_diario(df, diario)
+
+    assert quantidade(resultado, "1") == 3
+    assert colecao.COLUNA_DIARIO_APLICADO not in resultado
+
+def test_compactacao_sem_limpar_o_diario_nao_duplica_adicoes(armazenamento, diario_sem_limpeza):
+    colecao.adicionar_cartas(carta("1", 2), armazenamento)
+    assert colecao.descarregar_pendentes(armazenamento)[0]
+
+    # Tabelas já gravadas com a carta, mas a entrada continua no diário
+    assert len(armazenamento.carregar(DIARIO_PATH)) == 1
+    assert quantidade(colecao.carregar_colecao(armazenamento), "1") == 2
+
+    # Nova compactação com a entrada ainda no diário mantém o valor
+    sucesso, *_ = colecao.salvar_colecao(colecao.carregar_colecao(armazenamento), armazenamento)
+    assert sucesso
+    assert quantidade(colecao.carregar_colecao(armazenamento), "1") == 2
+
+    # Quando a limpeza volta a funcionar, o diário esvazia; a marca sai na compactação seguinte
+    diario_sem_limpeza["falhar"] = False
+    assert colecao.salvar_colecao(colecao.carregar_colecao(armazenamento), armazenamento)[0]
+    assert armazenamento.carregar(DIARIO_PATH).empty
+    assert quantidade(colecao.carregar_colecao(armazenamento), "1") == 2
+
+    assert colecao.salvar_colecao(colecao.carregar_colecao(armazenamento), armazenamento)[0]
+    assert armazenamento.carregar(PRECOS_PATH)[colecao.COLUNA_DIARIO_APLICADO].isna().all()
+    assert quantidade(colecao.carregar_colecao(armazenamento), "1") == 2
+
+def test_adicao_depois_da_compactacao_soma_uma_vez(armazenamento, diario_sem_limpeza):
+    colecao.adicionar_cartas(carta("1", 2), armazenamento)
+    colecao.descarregar_pendentes(armazenamento)
+
+    colecao.adicionar_cartas(carta("1", 3), armazenamento)
+    colecao.descarregar_pendentes(armazenamento)
+
+    assert quantidade(colecao.carregar_colecao(armazenamento), "1") == 5
+
+def test_mesclar_tres_vias_so_sobrescreve_as_celulas_alteradas():
+    base = pd.DataFrame({"colecao": ["abc", "abc"], "numero": ["1", "2"], "padrao": [1, 1], "preco_brl": [1.0, 1.0]})
+    nossa = base.assign(preco_brl=[2.0, 3.0])
+    deles = base.assign(padrao=[4, 1])
+
+    resultado = colecao.mesclar_tres_vias(base, nossa, deles).set_index("numero")
+
+    assert resultado.loc["1", "padrao"] == 4
+    assert list(resultado["preco_brl"]) == [2.0, 3.0]
+
+def test_refresh_nao_desfaz_adicao_feita_durante_ele(armazenamento, monkeypatch):
+    import utils.atualizacao as atualizacao
+    import utils.pipeline as pipeline
+
+    colecao.adicionar_cartas(carta("1", 1), armazenamento)
+    colecao.descarregar_pendentes(armazenamento)
+
+    def buscar(identificadores, **kwargs):
+        # Outra sessão adiciona 3 cópias enquanto o refresh busca os preços
+        colecao.adicionar_cartas(carta("1", 3), armazenamento)
+        colecao.descarregar_pendentes(armazenamento)
+        return [{"set": i["set"], "collector_number": i["collector_number"], "name": "Carta 1", "prices": {"usd": "2"}}
+                for i in identificadores]
+
+    monkeypatch.setattr(atualizacao, "buscar_detalhes_com_lotes", buscar)
+    monkeypatch.setattr(pipeline, "get_usd_to_brl", lambda: 5.0)
+    monkeypatch.setattr(pipeline, "registrar_snapshot", lambda df: None)
+    monkeypatch.setattr(pipeline, "limpar_cache_expirado", lambda: 0)
+
+    sucesso, _, df = pipeline.atualizar_colecao(armazenamento, completo=True)
+
+    assert sucesso
+    assert quantidade(df, "1") == 4
+    assert quantidade(colecao.carregar_colecao(armazenamento), "1") == 4
+
+def test_refresh_offline_sem_indice_sai_com_falha(armazenamento, monkeypatch, tmp_path):
+    import utils.api as api
+    import utils.pipeline as pipeline
+
+    colecao.adicionar_cartas(carta("1", 1), armazenamento)
+    colecao.descarregar_pendentes(armazenamento)
+
+    monkeypatch.setattr(api, "BULK_INDEX_PATH", str(tmp_path / "sem_indice.db"))
+    monkeypatch.setattr(pipeline, "get_armazenamento", lambda: armazenamento)
+    monkeypatch.setattr(pipeline, "get_usd_to_brl", lambda: 5.0)
+    monkeypatch.setattr(pipeline, "registrar_snapshot", lambda df: None)
+    monkeypatch.setattr(pipeline, "limpar_cache_expirado", lambda: 0)
+
+    sucesso, mensagem, df = pipeline.atualizar_colecao(armazenamento, offline=True)
+
+    assert not sucesso
+    assert "1 batch(es) failed, 1 card(s) not updated" in mensagem
+    assert df["preco_atualizado_em"].isna().all()
+    assert pipeline.main(["refresh", "--offline"]) == pipeline.SAIDA_FALHA
+
+def test_tarefa_conta_lotes_que_falharam(armazenamento, monkeypatch):
+    import utils.atualizacao as atualizacao
+    import utils.pipeline as pipeline
+    import utils.tarefas as tarefas
+
+    colecao.adicionar_cartas(pd.concat([carta("1", 1), carta("2", 1)]), armazenamento)
+    colecao.descarregar_pendentes(armazenamento)
+
+    def buscar(identificadores, ao_falhar=None, **kwargs):
+        # Um lote responde, o outro recebe um 503
+        ao_falhar(identificadores[1:], "HTTP 503")
+        return [{"set": i["set"], "collector_number": i["collector_number"], "name": "Carta", "prices": {"usd": "2"}}
+                for i in identificadores[:1]]
+
+    monkeypatch.setattr(atualizacao, "buscar_detalhes_com_lotes", buscar)
+    monkeypatch.setattr(pipeline, "get_usd_to_brl", lambda: 5.0)
+    monkeypatch.setattr(pipeline, "registrar_snapshot", lambda df: None)
+    monkeypatch.setattr(pipeline, "limpar_cache_expirado", lambda: 0)
+
+    tarefa, iniciada = tarefas.iniciar_refresh(armazenamento, completo=True)
+    tarefas._executor.submit(lambda: None).result()  # espera a única thread de trabalho terminar
+
+    assert iniciada
+    assert tarefa.estado == tarefas.FALHOU
+    assert tarefa.falhas == ["Scryfall batch of 1 card(s) failed: HTTP 503"]
+
+def test_importar_de_novo_depois_de_falha_soma_uma_vez(armazenamento, monkeypatch, tmp_path):
+    import utils.importacao as importacao
+    import utils.pipeline as pipeline
+
+    colecao.adicionar_cartas(carta("1", 1), armazenamento)
+    colecao.descarregar_pendentes(armazenamento)
+
+    monkeypatch.setattr(importacao, "IMPORTACAO_PROGRESSO_PATH", str(tmp_path / "progresso.json"))
+    monkeypatch.setattr(pipeline, "get_usd_to_brl", lambda: 5.0)
+
+    # A primeira gravação no diário falha; o lote volta para a fila de gravação
+    gravar = ArmazenamentoLocal.alterar
+    falhas = []
+
+    def alterar(self, df, path, versao_esperada=None):
+        if path == DIARIO_PATH and not falhas:
+            falhas.append(path)
+            return False, "falha simulada"
+        return gravar(self, df, path, versao_esperada)
+
+    monkeypatch.setattr(ArmazenamentoLocal, "alterar", alterar)
+    arquivo = tmp_path / "importar.csv"
+    arquivo.write_text("colecao,numero,padrao,foil\nabc,1,1,0\nabc,1,1,0\n")
+
+    with open(arquivo, "rb") as f:
+        sucesso, *_ = pipeline.importar_arquivo(f, "importar.csv", armazenamento)
+    assert not sucesso
+
+    # Importar de novo regrava as mesmas entradas, que o diário guarda uma vez só
+    with open(arquivo, "rb") as f:
+        sucesso, *_ = pipeline.importar_arquivo(f, "importar.csv", armazenamento)
+    assert sucesso
+    assert colecao.descarregar_pendentes(armazenamento)[0]
+
+    assert quantidade(colecao.carregar_colecao(armazenamento), "1") == 3
+
+def test_importar_offline_sem_indice_sai_com_falha_e_mantem_o_nome(armazenamento, monkeypatch, tmp_path):
+    import utils.api as api
+    import utils.importacao as importacao
+    import utils.pipeline as pipeline
+
+    monkeypatch.setattr(api, "BULK_INDEX_PATH", str(tmp_path / "sem_indice.db"))
+    monkeypatch.setattr(importacao, "IMPORTACAO_PROGRESSO_PATH", str(tmp_path / "progresso.json"))
+    monkeypatch.setattr(pipeline, "get_armazenamento", lambda: armazenamento)
+    monkeypatch.setattr(pipeline, "get_usd_to_brl", lambda: 5.0)
+    arquivo = tmp_path / "deck.txt"
+    arquivo.write_text("4 Lightning Bolt (2XM) 129\n1 Sol Ring (C21) 263\n")
+
+    gravados = []
+    with open(arquivo, "rb") as f:
+        sucesso, mensagem, linhas = pipeline.importar_arquivo(f, "deck.txt", armazenamento, offline=True, ao_gravar=gravados.append)
+
+    assert not sucesso
+    assert "0 fetched from Scryfall" in mensagem and "2 card(s) saved without details" in mensagem
+    assert linhas == 2 and sum(len(bloco) for bloco in gravados) == 2
+    df = colecao.carregar_colecao(armazenamento)
+    assert sorted(df["nome"]) == ["Lightning Bolt", "Sol Ring"]
+
+    arquivo.write_text("1 Opt (XLN) 65\n")
+    assert pipeline.main(["import", str(arquivo), "--offline"]) == pipeline.SAIDA_FALHA
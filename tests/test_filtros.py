@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.busca import registrar_colecao
+from utils.filtros import construir_indice, mascara_valores, mascara_nome, opcoes
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "colecao": ["2xm", "2xm", "isd", "c21"],
+        "numero": ["129", "130", "51", "263"],
+        "nome": ["Lightning Bolt", "Counterspell", "Delver of Secrets", "Sol Ring"],
+        "nome_2": [None, None, "Insectile Aberration", None],
+        "cores": ["R", "U", "U", None],
+        "raridade": ["uncommon", "uncommon", "common", "uncommon"],
+        "tipo_sem_traco": ["Instant", "Instant", "Creature", "Artifact"],
+        "padrao": [1, 0, 2, 1],
+        "foil": [0, 1, 1, 0],
+        "valor_medio_por_carta": [7.5, 5.0, 2.0, 10.0],
+    })
+
+@pytest.fixture
+def indice(df):
+    registrar_colecao(df, "teste-filtros")
+    return construir_indice(df)
+
+def linhas(df, mascara):
+    return list(df.loc[mascara, "nome"])
+
+def test_valores_da_mesma_dimensao_se_somam(df, indice):
+    assert linhas(df, mascara_valores(indice, "cores", ["R", "U"])) == ["Lightning Bolt", "Counterspell", "Delver of Secrets"]
+    assert not mascara_valores(indice, "cores", ["G"]).any()
+
+def test_dimensoes_diferentes_se_cruzam(df, indice):
+    mascara = mascara_valores(indice, "colecao", ["2xm"]) & mascara_valores(indice, "tipo", ["Instant"])
+    mascara &= mascara_valores(indice, "cores", ["U"])
+    assert linhas(df, mascara) == ["Counterspell"]
+
+def test_opcoes_so_mostram_valores_das_linhas_filtradas(indice):
+    mascara = mascara_valores(indice, "colecao", ["2xm"])
+    assert opcoes(indice, "cores", mascara) == ["R", "U"]
+    assert opcoes(indice, "raridade", mascara) == ["uncommon"]
+
+def test_acabamento(df, indice):
+    ambos = mascara_valores(indice, "acabamento", ["regular"]) & mascara_valores(indice, "acabamento", ["foil"])
+    assert linhas(df, ambos) == ["Delver of Secrets"]
+    assert linhas(df, mascara_valores(indice, "acabamento", ["foil"])) == ["Counterspell", "Delver of Secrets"]
+
+def test_nome_procura_nas_duas_faces_com_erro_de_digitacao(df, indice):
+    assert linhas(df, mascara_nome(indice, "insectile")) == ["Delver of Secrets"]
+    assert linhas(df, mascara_nome(indice, "lihgtning")) == ["Lightning Bolt"]
+    mascara = mascara_nome(indice, "sol ring") & mascara_valores(indice, "raridade", ["common"])
+    assert not mascara.any()
+
+def test_valor_fica_alinhado_as_linhas(indice):
+    assert np.array_equal(indice["valor"], [7.5, 5.0, 2.0, 10.0])
@@ -0,0 +1,113 @@
+import base64
+import re
+import pandas as pd
+import pytest
+import utils.github as github
+from utils.armazenamento import ArmazenamentoGitHub, ConflitoDeVersao
+
+class Resposta:
+    def __init__(self, status_code, dados=None):
+        self.status_code = status_code
+        self.dados = dados
+        self.text = str(dados)
+        self.headers = {}
+
+    def json(self):
+        return self.dados
+
+class GitHubFalso:
+    # Só o que a gravação em fragmentos usa: ref do branch, listagem da pasta, commits, árvores e o PATCH do ref
+    def __init__(self):
+        self.commits = {"c0": {}}  # sha -> {caminho: conteúdo}
+        self.head = "c0"
+        self.arvores = {}
+        self.pais = {}
+        self.depois_da_listagem = None
+        self.falhar_commit_pai = False
+
+    def get(self, url, headers=None):
+        if "/git/ref/heads/" in url:
+            return Resposta(200, {"object": {"sha": self.head}})
+        encontrado = re.search(r"/git/commits/(\w+)", url)
+        if encontrado:
+            if self.falhar_commit_pai:
+                return Resposta(502, {"message": "Bad Gateway"})
+            return Resposta(200, {"tree": {"sha": encontrado.group(1)}})
+        encontrado = re.search(r"/contents/([^?]+)\?ref=(\w+)", url)
+        if encontrado:
+            pasta, ref = encontrado.groups()
+            arvore = self.commits[self.head if ref == github.BRANCH else ref]
+            itens = [
+                {"name": caminho.split("/")[-1], "sha": github.sha_blob_git(conteudo), "type": "file"}
+                for caminho, conteudo in arvore.items() if caminho.startswith(pasta + "/")
+            ]
+            resposta = Resposta(200, itens) if itens else Resposta(404, {"message": "Not Found"})
+            if self.depois_da_listagem is not None:
+                self.depois_da_listagem()
+                self.depois_da_listagem = None
+            return resposta
+        raise AssertionError(url)
+
+    def post(self, url, headers=None, json=None):
+        if url.endswith("/git/trees"):
+            arvore = dict(self.commits[json["base_tree"]])
+            for entrada in json["tree"]:
+                if entrada.get("sha", "") is None:
+                    arvore.pop(entrada["path"], None)
+                else:
+                    arvore[entrada["path"]] = entrada["content"]
+            sha = f"t{len(self.arvores)}"
+            self.arvores[sha] = arvore
+            return Resposta(201, {"sha": sha})
+        if url.endswith("/git/commits"):
+            sha = f"c{len(self.commits)}"
+            self.commits[sha] = self.arvores[json["tree"]]
+            self.pais[sha] = json["parents"][0]
+            return Resposta(201, {"sha": sha})
+        raise AssertionError(url)
+
+    def patch(self, url, headers=None, json=None):
+        if self.pais[json["sha"]] != self.head:
+            return Resposta(422, {"message": "Update is not a fast forward"})
+        self.head = json["sha"]
+        return Resposta(200, {})
+
+    def commit_externo(self, caminho, conteudo):
+        # Outro escritor grava direto no branch
+        sha = f"c{len(self.commits)}"
+        self.commits[sha] = {**self.commits[self.head], caminho: conteudo}
+        self.head = sha
+
+@pytest.fixture
+def falso(monkeypatch, tmp_path):
+    falso = GitHubFalso()
+    monkeypatch.setattr(github, "GITHUB_CACHE_PATH", str(tmp_path / "cache"))
+    monkeypatch.setattr(github.requests, "get", falso.get)
+    monkeypatch.setattr(github.requests, "post", falso.post)
+    monkeypatch.setattr(github.requests, "patch", falso.patch)
+    return falso
+
+def precos(valor):
+    return pd.DataFrame({"colecao": ["abc"], "numero": ["1"], "preco_brl": [valor]})
+
+def test_commit_concorrente_depois_da_listagem_gera_conflito(falso):
+    armazenamento = ArmazenamentoGitHub(repo="dono/repo", token="t")
+    assert armazenamento.alterar(precos(1.0), "cartas_precos.csv")[0]
+    versao = armazenamento.versao("cartas_precos.csv")
+    fragmento = next(iter(falso.commits[falso.head]))
+
+    # Outro refresh grava o mesmo fragmento logo depois de a versão ser conferida
+    falso.depois_da_listagem = lambda: falso.commit_externo(fragmento, "colecao,numero,preco_brl\nabc,1,9.0\n")
+    with pytest.raises(ConflitoDeVersao):
+        armazenamento.alterar(precos(2.0), "cartas_precos.csv", versao_esperada=versao)
+
+    assert "9.0" in falso.commits[falso.head][fragmento]
+
+def test_falha_ao_ler_o_commit_pai_devolve_erro(falso):
+    armazenamento = ArmazenamentoGitHub(repo="dono/repo", token="t")
+    falso.falhar_commit_pai = True
+
+    sucesso, mensagem = armazenamento.alterar(precos(1.0), "cartas_precos.csv")
+
+    assert not sucesso
+    assert "502" in mensagem
@@ -0,0 +1,54 @@
+import pandas as pd
+from utils.helpers import extrair_detalhes_cartas, icone_valor_mana, analisar_custos_mana
+
+def test_extrair_detalhes_com_numero_inteiro():
+    # CSV com números de coleção só com dígitos: pandas lê a coluna como int64
+    df = pd.DataFrame({"colecao": ["2xm", "2xm"], "numero": [129, 130], "padrao": [1, 2]})
+    detalhes = [{"set": "2xm", "collector_number": "129", "name": "Lightning Bolt", "prices": {"usd": "1.50"}}]
+
+    resultado = extrair_detalhes_cartas(df, detalhes, cotacao=5.0)
+
+    assert list(resultado["nome"].fillna("")) == ["Lightning Bolt", ""]
+    assert list(resultado["preco_brl"].fillna(0)) == [7.5, 0]
+    assert resultado["numero"].tolist() == [129, 130]
+
+def test_icone_valor_mana():
+    assert icone_valor_mana(0.5) == "https://svgs.scryfall.io/card-symbols/HALF.svg"
+    assert icone_valor_mana(3.0) == "https://svgs.scryfall.io/card-symbols/3.svg"
+    assert icone_valor_mana(1e6) == "https://svgs.scryfall.io/card-symbols/1000000.svg"
+    assert icone_valor_mana(2.5) is None
+
+def custo(texto):
+    return analisar_custos_mana(pd.Series([texto])).iloc[0]
+
+def pips(linha):
+    return {cor: int(linha[f"pips_{cor}"]) for cor in "WUBRGC" if linha[f"pips_{cor}"]}
+
+def test_custo_hibrido():
+    linha = custo("{2}{W/U}{G/P}")
+    assert linha["mana_valor"] == 4
+    assert pips(linha) == {"W": 1, "U": 1, "G": 1}
+    assert linha["mana_simbolos"] == "2,W/U,G/P"
+
+def test_custo_hibrido_com_generico_conta_o_maior():
+    linha = custo("{2/W}{2/W}")
+    assert linha["mana_valor"] == 4
+    assert pips(linha) == {"W": 2}
+
+def test_custo_phyrexiano():
+    linha = custo("{W}{U/P}")
+    assert linha["mana_valor"] == 2
+    assert pips(linha) == {"W": 1, "U": 1}
+
+def test_custo_com_x_e_meia_mana():
+    assert custo("{X}{X}{G}")["mana_valor"] == 1
+    assert pips(custo("{X}{R}{R}")) == {"R": 2}
+    linha = custo("{HW}")
+    assert linha["mana_valor"] == 0.5
+    assert pips(linha) == {"W": 1}
+
+def test_custos_repetidos_e_vazios():
+    resultado = analisar_custos_mana(pd.Series(["{1}{B}", None, "{1}{B}"], index=[10, 11, 12]))
+    assert list(resultado.index) == [10, 11, 12]
+    assert list(resultado["mana_valor"]) == [2, 0, 2]
+    assert resultado.loc[11, "mana_simbolos"] == ""
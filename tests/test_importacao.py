@@ -0,0 +1,73 @@
+import json
+import pandas as pd
+import pytest
+import utils.importacao as importacao
+from utils.importacao import importar_em_blocos
+
+@pytest.fixture
+def progresso(tmp_path, monkeypatch):
+    caminho = tmp_path / "progresso.json"
+    monkeypatch.setattr(importacao, "IMPORTACAO_PROGRESSO_PATH", str(caminho))
+    return caminho
+
+def blocos():
+    # Três blocos de duas linhas; todas as cartas já estão na coleção, então nada vai para a API
+    return iter([
+        pd.DataFrame({"colecao": ["abc", "abc"], "numero": [str(i), str(i + 1)], "padrao": [1, 1], "foil": [0, 0]})
+        for i in (1, 3, 5)
+    ])
+
+CONHECIDAS = {("abc", str(i)) for i in range(1, 7)}
+
+def gravar_em(gravados):
+    def gravar(bloco):
+        gravados.append(bloco)
+        return True, "ok"
+    return gravar
+
+def test_retoma_do_ultimo_bloco_gravado(progresso):
+    gravados = []
+
+    def gravar_falhando_no_segundo(bloco):
+        if len(gravados) == 1:
+            return False, "falha simulada."
+        gravados.append(bloco)
+        return True, "ok"
+
+    sucesso, mensagem, importadas, _ = importar_em_blocos(blocos(), 5.0, gravar_falhando_no_segundo, identificador="arq", conhecidas=CONHECIDAS)
+    assert not sucesso and "resume" in mensagem
+    assert importadas == 2
+    assert json.loads(progresso.read_text()) == {"arquivo": "arq", "linhas": 2}
+
+    sucesso, _, importadas, _ = importar_em_blocos(blocos(), 5.0, gravar_em(gravados), identificador="arq", conhecidas=CONHECIDAS)
+    assert sucesso
+    assert importadas == 4
+    assert [list(bloco["numero"]) for bloco in gravados] == [["1", "2"], ["3", "4"], ["5", "6"]]
+    assert not progresso.exists()
+
+def test_retoma_no_meio_de_um_bloco(progresso):
+    # Progresso gravado com outro tamanho de bloco: a linha 3 já foi importada
+    progresso.write_text(json.dumps({"arquivo": "arq", "linhas": 3}))
+    gravados = []
+
+    importar_em_blocos(blocos(), 5.0, gravar_em(gravados), identificador="arq", conhecidas=CONHECIDAS)
+
+    assert [list(bloco["numero"]) for bloco in gravados] == [["4"], ["5", "6"]]
+
+def test_progresso_de_outro_arquivo_e_ignorado(progresso):
+    progresso.write_text(json.dumps({"arquivo": "outro", "linhas": 4}))
+    gravados = []
+
+    importar_em_blocos(blocos(), 5.0, gravar_em(gravados), identificador="arq", conhecidas=CONHECIDAS)
+
+    assert len(gravados) == 3
+
+def test_ids_estaveis_entre_execucoes(progresso):
+    execucoes = []
+    for _ in range(2):
+        gravados = []
+        importar_em_blocos(blocos(), 5.0, gravar_em(gravados), identificador="arq", conhecidas=CONHECIDAS)
+        execucoes.append([list(bloco["id"]) for bloco in gravados])
+
+    assert execucoes[0] == execucoes[1]
+    assert len({id_entrada for bloco in execucoes[0] for id_entrada in bloco}) == 6
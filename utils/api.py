@@ -1,7 +1,54 @@
+import os
 import requests
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 import streamlit as st
-from config import TTL
+from config import TTL, SCRYFALL_REQUISICOES_POR_SEGUNDO, SCRYFALL_LOTES_SIMULTANEOS, BULK_INDEX_PATH
+from utils.cache import ler_cache, gravar_cache
+from utils.bulk import buscar_no_indice_bulk
+
+SCRYFALL_COLLECTION_URL = "https://api.scryfall.com/cards/collection"
+
+class LimitadorDeTaxa:
+    # Token bucket: libera no máximo `taxa` requisições por segundo, com rajada de até `capacidade`
+    def __init__(self, taxa, capacidade=1):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.tokens = capacidade
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def aguardar(self):
+        while True:
+            with self.lock:
+                agora = time.monotonic()
+                self.tokens = min(self.capacidade, self.tokens + (agora - self.ultimo) * self.taxa)
+                self.ultimo = agora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) / self.taxa
+            time.sleep(espera)
+
+_sessao = None
+_sessao_lock = threading.Lock()
+_limitador = LimitadorDeTaxa(SCRYFALL_REQUISICOES_POR_SEGUNDO)
+
+def get_sessao():
+    # Uma única sessão HTTP com pool de conexões, reutilizada entre lotes e reruns
+    global _sessao
+    with _sessao_lock:
+        if _sessao is None:
+            _sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=SCRYFALL_LOTES_SIMULTANEOS)
+            _sessao.mount("https://", adaptador)
+            _sessao.headers.update({
+                "User-Agent": "mtg-cards-price-via-scryfall-api",
+                "Accept": "application/json"
+            })
+    return _sessao
 
 def get_usd_to_brl():
     try:
@@ -10,20 +57,62 @@ def get_usd_to_brl():
     except:
         return 5.0
 
-def buscar_detalhes_com_lotes(identificadores, tamanho_lote=75, mostrar_progresso=True):
-    todos_detalhes = []
+def _buscar_lote(lote, tentativas=3):
+    # Devolve (cartas, motivo da falha); o motivo é None quando a Scryfall respondeu
+    motivo = None
+    for _ in range(tentativas):
+        _limitador.aguardar()
+        try:
+            r = get_sessao().post(SCRYFALL_COLLECTION_URL, json={"identifiers": lote}, timeout=30)
+        except requests.RequestException as e:
+            motivo = str(e)
+            continue
+        if r.status_code == 200:
+            return r.json()["data"], None
+        motivo = f"HTTP {r.status_code}"
+        if r.status_code != 429:
+            break
+        # 429: a Scryfall pediu para desacelerar
+        time.sleep(float(r.headers.get("Retry-After", 1)))
+    return [], motivo
+
+def buscar_detalhes_com_lotes(identificadores, tamanho_lote=75, mostrar_progresso=True, usar_cache=True, offline=False, ttl=TTL,
+                              ao_falhar=None):
+    # `ao_falhar(lote, motivo)` é chamado para cada lote que ficou sem resposta
+    # Modo offline: lê tudo do índice bulk-data local, sem nenhuma requisição
+    if offline:
+        if not os.path.exists(BULK_INDEX_PATH):
+            if ao_falhar is not None and identificadores:
+                ao_falhar(identificadores, f"bulk index {BULK_INDEX_PATH} not found")
+            return []
+        todos_detalhes, _ = buscar_no_indice_bulk(identificadores, BULK_INDEX_PATH)
+        return todos_detalhes
+
+    # Só cartas ausentes ou mais velhas que `ttl` segundos no cache vão para a API
+    if usar_cache:
+        todos_detalhes, identificadores = ler_cache(identificadores, ttl=ttl)
+    else:
+        todos_detalhes = []
+
+    if not identificadores:
+        return todos_detalhes
+
     lotes = [identificadores[i:i + tamanho_lote] for i in range(0, len(identificadores), tamanho_lote)]
 
     progresso = st.progress(0, text="Buscando detalhes das cartas...") if mostrar_progresso else None
 
-    for i, lote in enumerate(lotes):
-        url = "https://api.scryfall.com/cards/collection"
-        r = requests.post(url, json={"identifiers": lote})
-        if r.status_code == 200:
-            todos_detalhes.extend(r.json()["data"])
-        if mostrar_progresso:
-            progresso.progress((i + 1) / len(lotes))
-        time.sleep(0.5)
+    # Vários lotes em voo; o ritmo é ditado pelo limitador, não pela latência de cada lote
+    with ThreadPoolExecutor(max_workers=SCRYFALL_LOTES_SIMULTANEOS) as executor:
+        futuros = {executor.submit(_buscar_lote, lote): lote for lote in lotes}
+        for i, futuro in enumerate(as_completed(futuros)):
+            dados, motivo = futuro.result()
+            if motivo is not None and ao_falhar is not None:
+                ao_falhar(futuros[futuro], motivo)
+            todos_detalhes.extend(dados)
+            if usar_cache and dados:
+                gravar_cache(dados)
+            if mostrar_progresso:
+                progresso.progress((i + 1) / len(lotes))
 
     if mostrar_progresso:
         progresso.empty()
@@ -0,0 +1,226 @@
+# Backends de armazenamento da coleção: GitHub (Contents API), pasta local, SQLite e Parquet.
+# Todos seguem o contrato de utils/github.py: carregar levanta exceção se o arquivo não existe,
+# alterar devolve (sucesso, mensagem). Para concorrência otimista, alterar aceita a
+# versão lida antes (versao_esperada) e levanta ConflitoDeVersao se outro escritor passou na frente.
+import os
+import re
+import sqlite3
+import threading
+import uuid
+import zlib
+import pandas as pd
+from config import (
+    ARMAZENAMENTO, REPO, GITHUB_FRAGMENTOS, get_github_token,
+    ARMAZENAMENTO_LOCAL_PATH, ARMAZENAMENTO_SQLITE_PATH, ARMAZENAMENTO_PARQUET_PATH
+)
+from utils.github import (
+    carregar_csv_do_github, carregar_fragmentos_do_github, salvar_fragmentos_em_github,
+    listar_fragmentos_do_github, versao_dos_fragmentos, commit_do_branch, BRANCH, ERRO_CONFLITO
+)
+
+class ConflitoDeVersao(Exception):
+    pass
+
+class Armazenamento:
+    identificador = ""
+
+    def carregar(self, path) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def versao(self, path):
+        # Identifica o conteúdo atual de `path`; None se não existe
+        return None
+
+    def carregar_com_versao(self, path):
+        versao = self.versao(path)
+        return self.carregar(path), versao
+
+    def alterar(self, df, path, versao_esperada=None):
+        raise NotImplementedError
+
+    def _verificar_versao(self, path, versao_esperada):
+        if versao_esperada is not None and self.versao(path) != versao_esperada:
+            raise ConflitoDeVersao(path)
+
+def fragmentar(df: pd.DataFrame, num_fragmentos=GITHUB_FRAGMENTOS) -> dict:
+    # Fragmento escolhido pelo hash do código do set: um refresh de um set só altera um arquivo
+    if "colecao" in df.columns:
+        df = df.sort_values([c for c in ["colecao", "numero"] if c in df.columns], kind="stable")
+        baldes = df["colecao"].astype(str).map(lambda c: zlib.crc32(c.encode()) % num_fragmentos)
+    else:
+        baldes = pd.Series(0, index=df.index)
+    return {
+        f"{balde:03d}.csv": df[baldes == balde].to_csv(index=False)
+        for balde in range(num_fragmentos)
+    }
+
+class ArmazenamentoGitHub(Armazenamento):
+    # Cada tabela é uma pasta de fragmentos (cartas_precos/000.csv, ...), baixados em paralelo
+    # e gravados num único commit que só inclui os fragmentos alterados
+    def __init__(self, repo=REPO, token=None):
+        self.repo = repo
+        self._token = token
+        self.identificador = f"github:{repo}"
+
+    @staticmethod
+    def _pasta(path):
+        return os.path.splitext(path)[0]
+
+    @property
+    def token(self):
+        # Lido só quando necessário, para não exigir st.secrets ao importar o módulo
+        if self._token is None:
+            self._token = get_github_token()
+        return self._token
+
+    def _listar(self, path, ref=BRANCH):
+        try:
+            return listar_fragmentos_do_github(self.repo, self._pasta(path), self.token, ref=ref)
+        except FileNotFoundError:
+            return None
+
+    def versao(self, path):
+        fragmentos = self._listar(path)
+        return versao_dos_fragmentos(fragmentos) if fragmentos is not None else None
+
+    def carregar_com_versao(self, path):
+        # Lista uma vez e baixa exatamente os fragmentos dessa versão
+        fragmentos = self._listar(path)
+        if fragmentos is None:
+            return carregar_csv_do_github(self.repo, path, self.token), None
+        df = carregar_fragmentos_do_github(self.repo, self._pasta(path), self.token, fragmentos)
+        return df, versao_dos_fragmentos(fragmentos)
+
+    def carregar(self, path):
+        return self.carregar_com_versao(path)[0]
+
+    def alterar(self, df, path, versao_esperada=None):
+        # Versão conferida e commit montado sobre o mesmo commit do branch
+        try:
+            commit_pai = commit_do_branch(self.repo, self.token)
+        except Exception as e:
+            return False, str(e)
+        remotos = self._listar(path, ref=commit_pai)
+        if versao_esperada is not None and (remotos is None or versao_dos_fragmentos(remotos) != versao_esperada):
+            raise ConflitoDeVersao(path)
+
+        sucesso, mensagem = salvar_fragmentos_em_github(
+            fragmentar(df), self.repo, self._pasta(path), self.token,
+            mensagem=f"Atualização de {path} via Streamlit", remotos=remotos or {}, commit_pai=commit_pai
+        )
+        if mensagem == ERRO_CONFLITO:
+            raise ConflitoDeVersao(path)
+        return sucesso, mensagem
+
+class ArmazenamentoLocal(Armazenamento):
+    _lock = threading.Lock()
+
+    def __init__(self, pasta=ARMAZENAMENTO_LOCAL_PATH):
+        self.pasta = pasta
+        self.identificador = f"local:{os.path.abspath(pasta)}"
+
+    def _caminho(self, path):
+        return os.path.join(self.pasta, path)
+
+    def versao(self, path):
+        try:
+            return str(os.stat(self._caminho(path)).st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+    def carregar(self, path):
+        return pd.read_csv(self._caminho(path))
+
+    def _gravar(self, df, caminho):
+        df.to_csv(caminho, index=False)
+
+    def alterar(self, df, path, versao_esperada=None):
+        with self._lock:
+            self._verificar_versao(path, versao_esperada)
+            try:
+                os.makedirs(os.path.dirname(self._caminho(path)) or ".", exist_ok=True)
+                temporario = self._caminho(path) + ".tmp"
+                self._gravar(df, temporario)
+                os.replace(temporario, self._caminho(path))
+            except Exception as e:
+                return False, f"Erro ao gravar {path}: {e}"
+        return True, "Arquivo salvo com sucesso!"
+
+class ArmazenamentoSQLite(Armazenamento):
+    def __init__(self, caminho=ARMAZENAMENTO_SQLITE_PATH):
+        self.caminho = caminho
+        self.identificador = f"sqlite:{os.path.abspath(caminho)}"
+
+    @staticmethod
+    def _tabela(path):
+        # cartas_precos.csv -> cartas_precos
+        return re.sub(r"\W", "_", os.path.splitext(os.path.basename(path))[0])
+
+    def _conectar(self):
+        conn = sqlite3.connect(self.caminho)
+        conn.execute("CREATE TABLE IF NOT EXISTS _versoes (tabela TEXT PRIMARY KEY, versao TEXT NOT NULL)")
+        return conn
+
+    def versao(self, path):
+        conn = self._conectar()
+        linha = conn.execute("SELECT versao FROM _versoes WHERE tabela = ?", (self._tabela(path),)).fetchone()
+        conn.close()
+        return linha[0] if linha else None
+
+    def carregar(self, path):
+        with self._conectar() as conn:
+            existe = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self._tabela(path),)
+            ).fetchone()
+            if not existe:
+                raise FileNotFoundError(path)
+            df = pd.read_sql(f'SELECT * FROM "{self._tabela(path)}"', conn)
+        conn.close()
+        return df
+
+    def alterar(self, df, path, versao_esperada=None):
+        conn = self._conectar()
+        try:
+            # BEGIN IMMEDIATE trava o banco entre a checagem de versão e a escrita;
+            # o to_sql do pandas faz o commit da transação inteira
+            conn.execute("BEGIN IMMEDIATE")
+            linha = conn.execute("SELECT versao FROM _versoes WHERE tabela = ?", (self._tabela(path),)).fetchone()
+            if versao_esperada is not None and (linha[0] if linha else None) != versao_esperada:
+                raise ConflitoDeVersao(path)
+            conn.execute("INSERT OR REPLACE INTO _versoes VALUES (?, ?)", (self._tabela(path), uuid.uuid4().hex))
+            df.to_sql(self._tabela(path), conn, if_exists="replace", index=False)
+        except ConflitoDeVersao:
+            conn.rollback()
+            raise
+        except Exception as e:
+            conn.rollback()
+            return False, f"Erro ao gravar {path}: {e}"
+        finally:
+            conn.close()
+        return True, "Arquivo salvo com sucesso!"
+
+class ArmazenamentoParquet(ArmazenamentoLocal):
+    def __init__(self, pasta=ARMAZENAMENTO_PARQUET_PATH):
+        super().__init__(pasta)
+        self.identificador = f"parquet:{os.path.abspath(pasta)}"
+
+    def _caminho(self, path):
+        return os.path.join(self.pasta, os.path.splitext(path)[0] + ".parquet")
+
+    def carregar(self, path):
+        return pd.read_parquet(self._caminho(path))
+
+    def _gravar(self, df, caminho):
+        df.to_parquet(caminho, index=False)
+
+BACKENDS = {
+    "github": ArmazenamentoGitHub,
+    "local": ArmazenamentoLocal,
+    "sqlite": ArmazenamentoSQLite,
+    "parquet": ArmazenamentoParquet,
+}
+
+def get_armazenamento(tipo=ARMAZENAMENTO) -> Armazenamento:
+    if tipo not in BACKENDS:
+        raise ValueError(f"Armazenamento desconhecido: {tipo}. Opções: {', '.join(BACKENDS)}")
+    return BACKENDS[tipo]()
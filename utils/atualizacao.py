@@ -0,0 +1,74 @@
+# Atualização incremental de preços: só busca de novo as linhas mais antigas que a idade máxima
+import pandas as pd
+from config import REFRESH_LOTES_POR_SALVAMENTO
+from utils.api import buscar_detalhes_com_lotes
+from utils.helpers import extrair_detalhes_cartas
+
+CHAVES = ["colecao", "numero"]
+COLUNA_ATUALIZACAO = "preco_atualizado_em"
+
+def agora_utc() -> pd.Timestamp:
+    return pd.Timestamp.now(tz="UTC").floor("s")
+
+def selecionar_desatualizadas(df: pd.DataFrame, idade_maxima: float, max_lotes=None, tamanho_lote=75) -> pd.DataFrame:
+    # Linhas sem data ou com preço mais velho que `idade_maxima` segundos, das mais antigas para as mais novas
+    atualizado_em = pd.to_datetime(df.get(COLUNA_ATUALIZACAO), utc=True, errors="coerce")
+    if atualizado_em is None:
+        atualizado_em = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns, UTC]")
+
+    limite = agora_utc() - pd.Timedelta(seconds=idade_maxima)
+    desatualizadas = df[atualizado_em.isna() | (atualizado_em < limite)]
+    desatualizadas = desatualizadas.loc[atualizado_em[desatualizadas.index].sort_values(na_position="first").index]
+
+    if max_lotes is not None:
+        desatualizadas = desatualizadas.head(max_lotes * tamanho_lote)
+
+    return desatualizadas
+
+def mesclar_atualizadas(df: pd.DataFrame, atualizadas: pd.DataFrame) -> pd.DataFrame:
+    # Sobrescreve só as linhas atualizadas (valores não nulos); as demais ficam intactas
+    base = df.set_index(CHAVES)
+    novas = atualizadas.set_index(CHAVES)
+    for coluna in novas.columns.difference(base.columns):
+        base[coluna] = pd.Series(dtype=novas[coluna].dtype)
+    base.update(novas)
+    return base.reset_index()
+
+def atualizar_precos_incremental(df, cotacao, idade_maxima, max_lotes=None, tamanho_lote=75,
+                                 salvar=None, ao_progredir=None, offline=False, ao_falhar=None):
+    # `ao_falhar(lote, motivo)` recebe cada lote que a Scryfall não respondeu.
+    # Devolve (df, quantas cartas ficaram sem resposta, por falha do lote ou por não existirem na Scryfall).
+    if COLUNA_ATUALIZACAO not in df.columns:
+        df[COLUNA_ATUALIZACAO] = None
+
+    desatualizadas = selecionar_desatualizadas(df, idade_maxima, max_lotes, tamanho_lote)
+    tamanho_bloco = tamanho_lote * REFRESH_LOTES_POR_SALVAMENTO
+    total = len(desatualizadas)
+    sem_resposta = 0
+
+    for inicio in range(0, total, tamanho_bloco):
+        bloco = desatualizadas.iloc[inicio:inicio + tamanho_bloco]
+        identificadores = [
+            {"set": colecao, "collector_number": numero}
+            for colecao, numero in zip(bloco["colecao"], bloco["numero"])
+        ]
+        # O cache só vale se for mais novo que a idade pedida: no modo "Full" (idade 0) tudo vai para a API
+        todos_detalhes = buscar_detalhes_com_lotes(
+            identificadores, tamanho_lote=tamanho_lote, mostrar_progresso=False, offline=offline, ttl=idade_maxima,
+            ao_falhar=ao_falhar
+        )
+
+        atualizadas = extrair_detalhes_cartas(bloco.copy(), todos_detalhes, cotacao)
+        # Cartas que a API não devolveu continuam desatualizadas e entram na próxima rodada
+        respondidas = atualizadas["nome"].notna()
+        sem_resposta += int((~respondidas).sum())
+        atualizadas[COLUNA_ATUALIZACAO] = respondidas.map({True: agora_utc().isoformat(), False: None})
+        df = mesclar_atualizadas(df, atualizadas)
+
+        # Salva a cada bloco para que uma interrupção não perca o que já foi feito
+        if salvar is not None:
+            salvar(df)
+        if ao_progredir is not None:
+            ao_progredir(min(inicio + tamanho_bloco, total), total)
+
+    return df, sem_resposta
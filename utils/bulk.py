@@ -0,0 +1,119 @@
+# Enriquecimento offline a partir dos arquivos bulk-data da Scryfall (ex.: default_cards.json)
+import json
+import sqlite3
+import sys
+from config import BULK_INDEX_PATH
+
+_decoder = json.JSONDecoder()
+
+def iterar_cartas_bulk(caminho, tamanho_bloco=1 << 20):
+    # Lê o array JSON do dump objeto a objeto, sem carregar o arquivo inteiro na memória
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        buffer = ""
+        pos = 0
+        fim_arquivo = False
+        inicio_array = False
+
+        while True:
+            # Pula espaços, o "[" inicial e as vírgulas entre objetos
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,[":
+                if buffer[pos] == "[":
+                    inicio_array = True
+                pos += 1
+
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+
+            if pos < len(buffer) and inicio_array:
+                try:
+                    carta, pos = _decoder.raw_decode(buffer, pos)
+                    yield carta
+                    continue
+                except json.JSONDecodeError:
+                    if fim_arquivo:
+                        raise
+
+            if fim_arquivo:
+                return
+
+            bloco = arquivo.read(tamanho_bloco)
+            fim_arquivo = not bloco
+            buffer = buffer[pos:] + bloco
+            pos = 0
+
+def compactar_carta(carta):
+    # Mantém só os campos usados por extrair_detalhes_cartas
+    def face_compacta(face):
+        return {
+            "name": face.get("name"),
+            "mana_cost": face.get("mana_cost"),
+            "colors": face.get("colors", []),
+            "image_uris": {"normal": face.get("image_uris", {}).get("normal")}
+        }
+
+    compacta = face_compacta(carta)
+    compacta.update({
+        "set": carta["set"],
+        "collector_number": carta["collector_number"],
+        "set_name": carta.get("set_name"),
+        "set_icon_svg_uri": carta.get("set_icon_svg_uri"),
+        "rarity": carta.get("rarity"),
+        "type_line": carta.get("type_line"),
+        "prices": {
+            "usd": carta.get("prices", {}).get("usd"),
+            "usd_foil": carta.get("prices", {}).get("usd_foil")
+        }
+    })
+    if carta.get("card_faces"):
+        compacta["card_faces"] = [face_compacta(face) for face in carta["card_faces"]]
+    return compacta
+
+def _conectar(caminho=BULK_INDEX_PATH):
+    conn = sqlite3.connect(caminho)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cartas (
+            colecao TEXT NOT NULL,
+            numero TEXT NOT NULL,
+            dados TEXT NOT NULL,
+            PRIMARY KEY (colecao, numero)
+        )
+    """)
+    return conn
+
+def construir_indice_bulk(caminho_dump, caminho_indice=BULK_INDEX_PATH, tamanho_lote=5000):
+    total = 0
+    lote = []
+    with _conectar(caminho_indice) as conn:
+        conn.execute("DELETE FROM cartas")
+        for carta in iterar_cartas_bulk(caminho_dump):
+            compacta = compactar_carta(carta)
+            lote.append((compacta["set"].lower(), str(compacta["collector_number"]), json.dumps(compacta)))
+            if len(lote) >= tamanho_lote:
+                conn.executemany("INSERT OR REPLACE INTO cartas VALUES (?, ?, ?)", lote)
+                total += len(lote)
+                lote = []
+        conn.executemany("INSERT OR REPLACE INTO cartas VALUES (?, ?, ?)", lote)
+        total += len(lote)
+    conn.close()
+    return total
+
+def buscar_no_indice_bulk(identificadores, caminho_indice=BULK_INDEX_PATH):
+    # Retorna (cartas encontradas no índice, identificadores ausentes)
+    encontradas, faltantes = [], []
+    with _conectar(caminho_indice) as conn:
+        for identificador in identificadores:
+            linha = conn.execute(
+                "SELECT dados FROM cartas WHERE colecao = ? AND numero = ?",
+                (str(identificador["set"]).lower(), str(identificador["collector_number"]))
+            ).fetchone()
+            if linha:
+                encontradas.append(json.loads(linha[0]))
+            else:
+                faltantes.append(identificador)
+    conn.close()
+    return encontradas, faltantes
+
+if __name__ == "__main__":
+    # Uso: python -m utils.bulk default_cards.json
+    total = construir_indice_bulk(sys.argv[1] if len(sys.argv) > 1 else "default_cards.json")
+    print(f"{total} cartas indexadas em {BULK_INDEX_PATH}")
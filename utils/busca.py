@@ -0,0 +1,178 @@
+# Busca aproximada de nomes de cartas por trigramas.
+# O índice é do processo inteiro e só cresce: nomes novos são acrescentados quando aparecem
+# (cartas adicionadas, índice bulk), então os ids já distribuídos continuam válidos.
+import functools
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+import numpy as np
+import pandas as pd
+from config import BULK_INDEX_PATH, BUSCA_SIMILARIDADE_MINIMA, BUSCA_ERROS_TOLERADOS, BUSCA_SUGESTOES
+
+@functools.lru_cache(maxsize=200_000)
+def normalizar(nome) -> str:
+    # Minúsculas, sem acentos e só letras/números separados por um espaço
+    if not isinstance(nome, str):
+        return ""
+    nome = unicodedata.normalize("NFKD", nome.lower())
+    nome = "".join(c for c in nome if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", nome).split())
+
+def trigramas(normalizado: str, completo=True) -> set:
+    # Com `completo=False` o fim não recebe espaço, para o texto valer como prefixo (autocompletar)
+    texto = f" {normalizado} " if completo else f" {normalizado}"
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+def _vizinhanca(texto: str, erros: int) -> set:
+    # Variações do texto com até `erros` trocas, faltas, sobras ou inversões de letras ("." vale qualquer letra)
+    variacoes = {texto}
+    for _ in range(erros):
+        novas = set()
+        for v in variacoes:
+            for i in range(len(v)):
+                novas.add(v[:i] + "." + v[i + 1:])  # troca
+                novas.add(v[:i] + v[i + 1:])  # falta
+                novas.add(v[:i] + "." + v[i:])  # sobra
+                if i + 1 < len(v):
+                    novas.add(v[:i] + v[i + 1] + v[i] + v[i + 2:])  # inversão
+        variacoes |= novas
+    return variacoes
+
+@functools.lru_cache(maxsize=256)
+def padrao_aproximado(normalizado: str, erros: int) -> re.Pattern:
+    # Casa o começo de uma palavra que esteja a até `erros` edições da consulta normalizada
+    variacoes = sorted(_vizinhanca(normalizado, erros) - {""}, key=len, reverse=True)
+    return re.compile(r"(?:^| )(?:" + "|".join(variacoes) + ")")
+
+class IndiceNomes:
+    def __init__(self):
+        self.nomes = []      # id -> nome normalizado
+        self.exibicao = []   # id -> nome como veio da carta
+        self.ids = {}        # nome normalizado -> id
+        self.impressoes = {}  # id -> {(colecao, numero)}
+        self._palavras = {}  # palavra -> ids dos nomes que a contêm
+        self._postagens = {}  # trigrama -> ids (np.int32, ordenados)
+        self._num_trigramas = np.zeros(0, dtype=np.int32)
+        self._lock = threading.Lock()
+
+    def adicionar(self, nomes) -> int:
+        # Acrescenta só os nomes ainda desconhecidos; devolve quantos entraram
+        novos_por_trigrama = {}
+        contagens = []
+        with self._lock:
+            for nome in nomes:
+                normalizado = normalizar(nome)
+                if not normalizado or normalizado in self.ids:
+                    continue
+                id_nome = len(self.nomes)
+                self.ids[normalizado] = id_nome
+                self.nomes.append(normalizado)
+                self.exibicao.append(nome)
+                tris = trigramas(normalizado)
+                contagens.append(len(tris))
+                for tri in tris:
+                    novos_por_trigrama.setdefault(tri, []).append(id_nome)
+                for palavra in set(normalizado.split()):
+                    self._palavras.setdefault(palavra, []).append(id_nome)
+
+            for tri, novos in novos_por_trigrama.items():
+                novos = np.array(novos, dtype=np.int32)
+                atual = self._postagens.get(tri)
+                self._postagens[tri] = novos if atual is None else np.concatenate([atual, novos])
+            if contagens:
+                self._num_trigramas = np.concatenate([self._num_trigramas, np.array(contagens, dtype=np.int32)])
+        return len(contagens)
+
+    def adicionar_impressoes(self, nomes, colecoes, numeros):
+        self.adicionar(nomes)
+        for nome, colecao, numero in zip(nomes, colecoes, numeros):
+            id_nome = self.ids.get(normalizar(nome))
+            if id_nome is not None:
+                self.impressoes.setdefault(id_nome, set()).add((str(colecao), str(numero)))
+
+    def ids_de(self, nomes: pd.Series) -> np.ndarray:
+        # Id de cada nome da série (-1 quando vazio ou desconhecido)
+        mapa = {nome: self.ids.get(normalizar(nome), -1) for nome in nomes.dropna().unique()}
+        return nomes.map(mapa).fillna(-1).to_numpy(dtype=np.int64)
+
+    def buscar(self, consulta, minimo=BUSCA_SIMILARIDADE_MINIMA, erros=BUSCA_ERROS_TOLERADOS, limite=None):
+        # Devolve [(id, pontuação)] do mais parecido para o menos parecido.
+        # Pontuação: fração dos trigramas da consulta presentes no nome; empates favorecem nomes
+        # mais curtos (coeficiente de Dice). Acima de `minimo` o nome entra direto; abaixo, só se a
+        # consulta estiver a até `erros` edições do começo de alguma palavra do nome.
+        normalizado = normalizar(consulta)
+        if not normalizado:
+            return []
+        tris = trigramas(normalizado, completo=False)
+        total = len(self.nomes)
+        erros = min(erros, len(normalizado) // 4)  # no máximo um erro a cada 4 letras
+
+        if not tris:
+            # Consulta de uma letra: prefixo de alguma palavra
+            ids = [i for i, nome in enumerate(self.nomes) if f" {nome}".find(f" {normalizado}") >= 0]
+            return [(i, 1.0) for i in ids[:limite]]
+
+        postagens = [self._postagens[tri] for tri in tris if tri in self._postagens]
+        acertos = np.bincount(np.concatenate(postagens), minlength=total) if postagens else np.zeros(total, dtype=np.int64)
+        contencao = acertos / len(tris)
+
+        # Uma edição estraga até 4 trigramas (uma transposição), então o corte cai nas consultas curtas
+        corte = min(minimo, (len(tris) - 4 * erros) / len(tris))
+        candidatos = np.flatnonzero((acertos > 0) & (contencao >= corte))
+        padrao = padrao_aproximado(normalizado, erros)
+        aceitos = [i for i in candidatos if contencao[i] >= minimo or padrao.search(self.nomes[i])]
+        if corte <= 0 and " " not in normalizado:
+            # Palavra curta: o erro pode ter estragado todos os trigramas, então compara com cada palavra conhecida
+            aceitos = sorted(set(aceitos) | {
+                id_nome for palavra, ids in self._palavras.items() if padrao.match(palavra) for id_nome in ids
+            })
+
+        aceitos = np.array(aceitos, dtype=np.int64)
+        dice = 2 * acertos[aceitos] / (len(tris) + self._num_trigramas[aceitos])
+        ordem = np.lexsort((-dice, -contencao[aceitos]))[:limite]
+        return [(int(aceitos[i]), float(contencao[aceitos[i]])) for i in ordem]
+
+_indice = IndiceNomes()
+_bulk_carregado = False
+_versoes_registradas = set()
+
+def indice_nomes() -> IndiceNomes:
+    return _indice
+
+def registrar_colecao(df: pd.DataFrame, versao: str):
+    # Acrescenta ao índice os nomes e impressões de uma versão da coleção (só o que é novo entra)
+    if versao in _versoes_registradas:
+        return
+    for coluna in ["nome", "nome_2"]:
+        if coluna in df:
+            validas = df[df[coluna].notna()].drop_duplicates(subset=[coluna, "colecao", "numero"])
+            _indice.adicionar_impressoes(list(validas[coluna]), list(validas["colecao"]), list(validas["numero"]))
+    _versoes_registradas.add(versao)
+
+def _carregar_bulk():
+    # Nomes e impressões de todas as cartas do índice bulk, uma vez por processo
+    global _bulk_carregado
+    if _bulk_carregado:
+        return
+    _bulk_carregado = True
+    if not os.path.exists(BULK_INDEX_PATH):
+        return
+    try:
+        conn = sqlite3.connect(BULK_INDEX_PATH)
+        linhas = conn.execute("SELECT json_extract(dados, '$.name'), colecao, numero FROM cartas").fetchall()
+        conn.close()
+    except sqlite3.Error:
+        return
+    if linhas:
+        nomes, colecoes, numeros = zip(*linhas)
+        _indice.adicionar_impressoes(list(nomes), colecoes, numeros)
+
+def sugerir(consulta, limite=BUSCA_SUGESTOES) -> list[dict]:
+    # Autocompletar do "Add Card": nome mais parecido primeiro, com as impressões conhecidas
+    _carregar_bulk()
+    return [
+        {"nome": _indice.exibicao[id_nome], "impressoes": sorted(_indice.impressoes.get(id_nome, []))}
+        for id_nome, _ in _indice.buscar(consulta, limite=limite)
+    ]
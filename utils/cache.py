@@ -0,0 +1,57 @@
+# Cache local (SQLite) das respostas da Scryfall, chaveado por (set, collector_number)
+import json
+import sqlite3
+import time
+from config import CACHE_PATH, TTL
+
+def _conectar(caminho=CACHE_PATH):
+    conn = sqlite3.connect(caminho)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cartas (
+            colecao TEXT NOT NULL,
+            numero TEXT NOT NULL,
+            dados TEXT NOT NULL,
+            buscado_em REAL NOT NULL,
+            PRIMARY KEY (colecao, numero)
+        )
+    """)
+    return conn
+
+def _chave(identificador):
+    return str(identificador["set"]).lower(), str(identificador["collector_number"])
+
+def ler_cache(identificadores, ttl=TTL, caminho=CACHE_PATH):
+    # Retorna (cartas válidas no cache, identificadores que precisam ir para a API)
+    encontradas, faltantes = [], []
+    limite = time.time() - ttl
+
+    with _conectar(caminho) as conn:
+        for identificador in identificadores:
+            linha = conn.execute(
+                "SELECT dados, buscado_em FROM cartas WHERE colecao = ? AND numero = ?",
+                _chave(identificador)
+            ).fetchone()
+            if linha and linha[1] >= limite:
+                encontradas.append(json.loads(linha[0]))
+            else:
+                faltantes.append(identificador)
+    conn.close()
+
+    return encontradas, faltantes
+
+def gravar_cache(cartas, caminho=CACHE_PATH):
+    agora = time.time()
+    registros = [
+        (str(carta["set"]).lower(), str(carta["collector_number"]), json.dumps(carta), agora)
+        for carta in cartas
+    ]
+    with _conectar(caminho) as conn:
+        conn.executemany("INSERT OR REPLACE INTO cartas VALUES (?, ?, ?, ?)", registros)
+    conn.close()
+
+def limpar_cache_expirado(ttl=TTL, caminho=CACHE_PATH):
+    # Apaga as cartas mais velhas que `ttl` (que nenhuma leitura usaria mais); devolve quantas saíram
+    with _conectar(caminho) as conn:
+        removidas = conn.execute("DELETE FROM cartas WHERE buscado_em < ?", (time.time() - ttl,)).rowcount
+    conn.close()
+    return removidas
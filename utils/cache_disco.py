@@ -0,0 +1,36 @@
+# Limite de tamanho das pastas de cache em disco (miniaturas, DataFrames do GitHub):
+# quando passam do limite, os arquivos usados há mais tempo são removidos (LRU por mtime).
+import os
+
+def limitar_pasta(pasta, limite_bytes, extensao) -> int:
+    # Acima do limite, remove os menos usados até ficar em 90% dele; devolve os bytes que restaram
+    arquivos = _arquivos(pasta, extensao)
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    if total <= limite_bytes:
+        return total
+    for caminho, tamanho, _ in sorted(arquivos, key=lambda arquivo: arquivo[2]):
+        if total <= limite_bytes * 0.9:
+            break
+        try:
+            os.remove(caminho)
+            total -= tamanho
+        except FileNotFoundError:
+            pass
+    return total
+
+def _arquivos(pasta, extensao):
+    # [(caminho, tamanho, mtime)]; arquivos removidos por outra thread no meio da varredura são ignorados
+    arquivos = []
+    try:
+        entradas = list(os.scandir(pasta))
+    except FileNotFoundError:
+        return arquivos
+    for entrada in entradas:
+        if not entrada.name.endswith(extensao):
+            continue
+        try:
+            estado = entrada.stat()
+        except FileNotFoundError:
+            continue
+        arquivos.append((entrada.path, estado.st_size, estado.st_mtime))
+    return arquivos
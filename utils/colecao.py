@@ -0,0 +1,406 @@
+# Armazenamento da coleção em duas tabelas: metadados estáticos (gravados uma vez por carta)
+# e uma tabela estreita com quantidades e preços, que é a única reescrita a cada atualização.
+# Adições e mudanças de quantidade vão para um diário (append-only) aplicado por cima do snapshot.
+# Escritas usam concorrência otimista: em conflito, relê, mescla por (colecao, numero) e tenta de novo.
+# A compactação grava, junto com a tabela de preços, os ids das entradas do diário já dobradas em cada
+# linha; essas entradas são ignoradas na leitura, então apagá-las do diário depois é só limpeza.
+# A última leitura fica num Parquet local tipado, reaproveitado enquanto as versões das tabelas não mudam.
+import hashlib
+import json
+import logging
+import os
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from config import (
+    CSV_PATH, METADADOS_PATH, PRECOS_PATH, DIARIO_PATH, DIARIO_LIMITE_COMPACTACAO, GRAVACAO_TENTATIVAS,
+    SNAPSHOT_PATH
+)
+from utils.armazenamento import ConflitoDeVersao
+from utils.fila_escrita import FilaDeEscrita
+
+CHAVES = ["colecao", "numero"]
+COLUNAS_METADADOS = [
+    "nome", "mana_cost", "cores", "imagem", "nome_2", "imagem_2",
+    "colecao_nome", "icone_colecao", "raridade", "tipo"
+]
+COLUNAS_PRECOS = ["padrao", "foil", "obs", "preco_brl", "preco_brl_foil", "preco_atualizado_em"]
+
+COLUNAS_DIARIO = ["id", "registrado_em", "operacao"] + CHAVES + COLUNAS_METADADOS + COLUNAS_PRECOS
+# Só na tabela de preços: ids (separados por espaço) das entradas do diário já contidas na linha
+COLUNA_DIARIO_APLICADO = "diario_aplicado"
+
+logger = logging.getLogger(__name__)
+
+# Tipos gravados no snapshot Parquet; o que não está aqui fica como texto
+TIPOS_COLECAO = {
+    "padrao": "Int32", "foil": "Int32",
+    "preco_brl": "float64", "preco_brl_foil": "float64",
+}
+
+# Hash dos metadados que sabemos estar gravados, por armazenamento
+_metadados_remotos = {}
+# Número de entradas que sabemos existir no diário, por armazenamento
+_tamanho_diario = {}
+# Fila de gravação do diário, por armazenamento
+_filas = {}
+
+def dividir_colecao(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    df = df.assign(colecao=df["colecao"].astype(str), numero=df["numero"].astype(str))
+    metadados = (
+        df.reindex(columns=CHAVES + COLUNAS_METADADOS)
+        .drop_duplicates(subset=CHAVES, keep="last")
+        .sort_values(CHAVES)
+        .reset_index(drop=True)
+    )
+    precos = df.reindex(columns=CHAVES + COLUNAS_PRECOS)
+    return metadados, precos
+
+def juntar_colecao(metadados: pd.DataFrame, precos: pd.DataFrame) -> pd.DataFrame:
+    metadados = metadados.assign(numero=metadados["numero"].astype(str))
+    precos = precos.assign(numero=precos["numero"].astype(str))
+    return precos.merge(metadados, on=CHAVES, how="left")
+
+def _hash_metadados(metadados: pd.DataFrame) -> str:
+    return hashlib.sha1(metadados.to_csv(index=False).encode()).hexdigest()
+
+def _ids_aplicados(df: pd.DataFrame) -> set:
+    if COLUNA_DIARIO_APLICADO not in df:
+        return set()
+    return {id_entrada for ids in df[COLUNA_DIARIO_APLICADO] if isinstance(ids, str) for id_entrada in ids.split()}
+
+def _ids_por_chave(diario: pd.DataFrame) -> dict:
+    # (colecao, numero) -> ids das entradas do diário dessa carta, para marcar as linhas compactadas
+    if diario.empty or "id" not in diario:
+        return {}
+    ids = {}
+    for chave, id_entrada in zip(zip(diario["colecao"].astype(str), diario["numero"].astype(str)), diario["id"].astype(str)):
+        ids.setdefault(chave, []).append(id_entrada)
+    return {chave: " ".join(lista) for chave, lista in ids.items()}
+
+def aplicar_diario(df: pd.DataFrame, diario: pd.DataFrame) -> pd.DataFrame:
+    # Reaplica as entradas em ordem: "adicionar" insere a carta ou soma às quantidades,
+    # "quantidade" define os valores absolutos de padrao/foil. Entradas já marcadas na tabela
+    # de preços (compactadas, mas ainda não apagadas do diário) são ignoradas.
+    aplicadas = _ids_aplicados(df)
+    df = df.drop(columns=[COLUNA_DIARIO_APLICADO], errors="ignore")
+    if "id" in diario and aplicadas:
+        diario = diario[~diario["id"].astype(str).isin(aplicadas)]
+    if diario.empty:
+        return df
+
+    base = df.assign(colecao=df["colecao"].astype(str), numero=df["numero"].astype(str)).set_index(CHAVES)
+    for coluna in ["padrao", "foil"]:
+        base[coluna] = pd.to_numeric(base[coluna], errors="coerce").fillna(0)
+    novas = {}
+
+    for _, entrada in diario.sort_values("registrado_em", kind="stable").iterrows():
+        chave = (str(entrada["colecao"]), str(entrada["numero"]))
+        padrao = pd.to_numeric(entrada["padrao"], errors="coerce")
+        foil = pd.to_numeric(entrada["foil"], errors="coerce")
+        padrao, foil = (0 if pd.isna(padrao) else padrao), (0 if pd.isna(foil) else foil)
+
+        if chave in novas:
+            linha = novas[chave]
+        elif chave in base.index:
+            linha = None
+        elif entrada["operacao"] == "adicionar":
+            novas[chave] = entrada.reindex(base.columns).copy()
+            novas[chave][["padrao", "foil"]] = [padrao, foil]
+            continue
+        else:
+            continue
+
+        if entrada["operacao"] == "adicionar":
+            padrao += (linha["padrao"] if linha is not None else base.at[chave, "padrao"])
+            foil += (linha["foil"] if linha is not None else base.at[chave, "foil"])
+
+        if linha is not None:
+            linha[["padrao", "foil"]] = [padrao, foil]
+        else:
+            base.loc[chave, ["padrao", "foil"]] = [padrao, foil]
+
+    if novas:
+        adicionadas = pd.DataFrame(list(novas.values()), index=pd.MultiIndex.from_tuples(novas, names=CHAVES))
+        base = pd.concat([base, adicionadas])
+
+    return base.reset_index()
+
+def _normalizar_para_comparacao(df: pd.DataFrame) -> pd.DataFrame:
+    # 1 e 1.0, ou None e NaN, não devem contar como alteração
+    normalizado = {}
+    for coluna in df.columns:
+        numerico = pd.to_numeric(df[coluna], errors="coerce")
+        if numerico.notna().sum() == df[coluna].notna().sum():
+            normalizado[coluna] = numerico.astype(float).fillna(float("-inf"))
+        else:
+            normalizado[coluna] = df[coluna].astype(str).where(df[coluna].notna(), "")
+    return pd.DataFrame(normalizado, index=df.index)
+
+def _indexar(df: pd.DataFrame) -> pd.DataFrame:
+    return (
+        df.assign(colecao=df["colecao"].astype(str), numero=df["numero"].astype(str))
+        .drop_duplicates(subset=CHAVES, keep="last")
+        .set_index(CHAVES)
+    )
+
+def mesclar_tres_vias(base, nossa: pd.DataFrame, deles: pd.DataFrame) -> pd.DataFrame:
+    # Por célula: as colunas que mudamos em relação à base vencem; as outras vêm da versão atual
+    # (deles). Assim um refresh, que muda os preços de todas as linhas, não desfaz uma quantidade
+    # alterada no meio dele. Linhas novas nossas entram inteiras; sem base, todas as nossas vencem.
+    nossa_idx, deles_idx = _indexar(nossa), _indexar(deles)
+    colunas = list(dict.fromkeys(list(nossa_idx.columns) + list(deles_idx.columns)))
+    resultado = deles_idx.reindex(columns=colunas)
+
+    if base is None:
+        inteiras = nossa_idx.index
+    else:
+        base_idx = _indexar(base).reindex(columns=colunas)
+        comuns = nossa_idx.index.intersection(base_idx.index)
+        diferentes = (
+            _normalizar_para_comparacao(nossa_idx.reindex(index=comuns, columns=colunas))
+            != _normalizar_para_comparacao(base_idx.loc[comuns])
+        )
+        alteradas = comuns[diferentes.any(axis=1).to_numpy()]
+        removidas = base_idx.index.difference(nossa_idx.index)
+        resultado = resultado.drop(index=removidas.intersection(resultado.index))
+
+        # Linhas que os dois lados têm: só as células alteradas por nós
+        em_ambas = alteradas.intersection(resultado.index)
+        mescladas = resultado.loc[em_ambas].mask(
+            diferentes.loc[em_ambas, colunas], nossa_idx.reindex(index=em_ambas, columns=colunas)
+        )
+        resultado = pd.concat([resultado.drop(index=em_ambas), mescladas])
+        # Novas para a base, ou alteradas por nós e removidas por eles: nossa linha inteira
+        inteiras = nossa_idx.index.difference(base_idx.index).append(alteradas.difference(resultado.index))
+
+    resultado = pd.concat([
+        resultado.drop(index=inteiras.intersection(resultado.index)),
+        nossa_idx.reindex(index=inteiras, columns=colunas)
+    ])
+    return resultado.reset_index()[nossa.columns.union(resultado.columns, sort=False)]
+
+def _carregar_diario(armazenamento):
+    # Só "não existe" vira diário vazio; outros erros (rede, limite, autenticação) sobem,
+    # senão a próxima gravação sobrescreveria o diário sem checar a versão
+    try:
+        diario, versao = armazenamento.carregar_com_versao(DIARIO_PATH)
+    except FileNotFoundError:
+        diario, versao = pd.DataFrame(columns=COLUNAS_DIARIO), None
+    _tamanho_diario[armazenamento.identificador] = len(diario)
+    return diario, versao
+
+def _carregar_estado(armazenamento):
+    # Snapshot + diário aplicado, com as versões lidas de cada tabela
+    diario, versao_diario = _carregar_diario(armazenamento)
+    estado = {
+        "diario": versao_diario,
+        "ids_diario": list(diario["id"]) if "id" in diario else [],
+        "ids_por_chave": _ids_por_chave(diario),
+    }
+
+    try:
+        metadados, estado["metadados"] = armazenamento.carregar_com_versao(METADADOS_PATH)
+        precos, estado["precos"] = armazenamento.carregar_com_versao(PRECOS_PATH)
+    except FileNotFoundError:
+        # Coleção ainda no CSV único; é migrada para as duas tabelas no próximo salvamento.
+        # Qualquer outro erro sobe: cair no CSV antigo com versões None sobrescreveria as tabelas atuais.
+        _metadados_remotos.pop(armazenamento.identificador, None)
+        estado["metadados"] = estado["precos"] = None
+        try:
+            legado = armazenamento.carregar(CSV_PATH)
+        except FileNotFoundError:
+            # Armazenamento novo: coleção vazia, criada na primeira gravação
+            legado = pd.DataFrame(columns=CHAVES + COLUNAS_METADADOS + COLUNAS_PRECOS)
+        return aplicar_diario(legado, diario), estado
+
+    df = juntar_colecao(metadados, precos)
+    _metadados_remotos[armazenamento.identificador] = _hash_metadados(dividir_colecao(df)[0])
+    return aplicar_diario(df, diario), estado
+
+def tipar_colecao(df: pd.DataFrame) -> pd.DataFrame:
+    # Chaves e textos como str, quantidades inteiras (nulas continuam nulas) e preços float
+    tipado = {}
+    for coluna in df.columns:
+        if coluna in TIPOS_COLECAO:
+            tipado[coluna] = pd.to_numeric(df[coluna], errors="coerce").astype(TIPOS_COLECAO[coluna])
+        else:
+            tipado[coluna] = df[coluna].astype(str).where(df[coluna].notna())
+    return pd.DataFrame(tipado, index=df.index)
+
+def _chave_snapshot(armazenamento, versoes: dict) -> dict:
+    return {"identificador": armazenamento.identificador, **{k: versoes.get(k) for k in ["metadados", "precos", "diario"]}}
+
+def _gravar_snapshot(armazenamento, df: pd.DataFrame, estado: dict):
+    # `df` já tipado por tipar_colecao
+    if estado["metadados"] is None or estado["precos"] is None:
+        return  # coleção ainda no CSV único: sem versões confiáveis para validar o snapshot
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    info = {
+        **_chave_snapshot(armazenamento, estado),
+        "hash_metadados": _metadados_remotos.get(armazenamento.identificador),
+        "tamanho_diario": _tamanho_diario.get(armazenamento.identificador, 0),
+    }
+    tabela = tabela.replace_schema_metadata({**(tabela.schema.metadata or {}), b"colecao": json.dumps(info).encode()})
+    temporario = SNAPSHOT_PATH + ".tmp"
+    pq.write_table(tabela, temporario)
+    os.replace(temporario, SNAPSHOT_PATH)
+
+def _ler_snapshot(armazenamento, colunas=None):
+    # Devolve o snapshot local se as três tabelas ainda estão na versão em que ele foi gravado
+    try:
+        info = json.loads(pq.read_schema(SNAPSHOT_PATH).metadata[b"colecao"])
+    except (OSError, KeyError, TypeError, ValueError):
+        return None
+
+    versoes = {
+        "metadados": armazenamento.versao(METADADOS_PATH),
+        "precos": armazenamento.versao(PRECOS_PATH),
+        "diario": armazenamento.versao(DIARIO_PATH),
+    }
+    if info != {**info, **_chave_snapshot(armazenamento, versoes)}:
+        return None
+
+    if info["hash_metadados"] is not None:
+        _metadados_remotos[armazenamento.identificador] = info["hash_metadados"]
+    _tamanho_diario[armazenamento.identificador] = info["tamanho_diario"]
+    if colunas is not None:
+        existentes = pq.read_schema(SNAPSHOT_PATH).names
+        colunas = [c for c in dict.fromkeys(CHAVES + list(colunas)) if c in existentes]
+    return pd.read_parquet(SNAPSHOT_PATH, columns=colunas)
+
+def carregar_colecao(armazenamento, colunas=None) -> pd.DataFrame:
+    # Grava antes o que estiver na fila, para a leitura já enxergar as próprias alterações.
+    # `colunas` limita a leitura do snapshot local às colunas pedidas (mais as chaves).
+    _fila(armazenamento).descarregar()
+
+    df = _ler_snapshot(armazenamento, colunas)
+    if df is not None:
+        return df
+
+    df, estado = _carregar_estado(armazenamento)
+    df = tipar_colecao(df)
+    _gravar_snapshot(armazenamento, df, estado)
+    if colunas is not None:
+        df = df[[c for c in dict.fromkeys(CHAVES + list(colunas)) if c in df.columns]]
+    return df
+
+def _remover_do_diario(armazenamento, ids):
+    # Tira só as entradas já dobradas no snapshot; entradas novas de outros escritores ficam
+    for _ in range(GRAVACAO_TENTATIVAS):
+        diario, versao = _carregar_diario(armazenamento)
+        restante = diario[~diario["id"].isin(ids)] if "id" in diario else diario
+        if len(restante) == len(diario):
+            return True, "Diário já atualizado."
+        try:
+            sucesso, mensagem = armazenamento.alterar(restante.reindex(columns=COLUNAS_DIARIO), DIARIO_PATH, versao_esperada=versao)
+        except ConflitoDeVersao:
+            continue
+        if sucesso:
+            _tamanho_diario[armazenamento.identificador] = len(restante)
+        return sucesso, mensagem
+    return False, "Conflito persistente ao atualizar o diário."
+
+def salvar_colecao(df: pd.DataFrame, armazenamento, base=None):
+    # Grava um snapshot completo e tira do diário as entradas que ele já contém.
+    # `base` é a coleção a partir da qual `df` foi editado: só as células que mudaram em relação
+    # a ela sobrescrevem a versão atual. Os metadados só são regravados quando mudam.
+    # Devolve (sucesso, mensagem, coleção gravada), que é o que a sessão deve passar a mostrar.
+    _fila(armazenamento).descarregar()
+
+    for _ in range(GRAVACAO_TENTATIVAS):
+        try:
+            deles, estado = _carregar_estado(armazenamento)
+        except Exception as e:
+            return False, f"Erro ao ler a coleção atual: {e}", None
+        final = mesclar_tres_vias(base, df, deles)
+        metadados, precos = dividir_colecao(final)
+        hash_atual = _hash_metadados(metadados)
+        # Marca as entradas do diário já dobradas: gravadas na mesma escrita que os preços
+        precos[COLUNA_DIARIO_APLICADO] = [
+            estado["ids_por_chave"].get(chave) for chave in zip(precos["colecao"], precos["numero"])
+        ]
+
+        try:
+            if _metadados_remotos.get(armazenamento.identificador) != hash_atual:
+                sucesso, mensagem = armazenamento.alterar(metadados, METADADOS_PATH, versao_esperada=estado["metadados"])
+                if not sucesso:
+                    return sucesso, mensagem, None
+                _metadados_remotos[armazenamento.identificador] = hash_atual
+
+            sucesso, mensagem = armazenamento.alterar(precos, PRECOS_PATH, versao_esperada=estado["precos"])
+        except ConflitoDeVersao:
+            continue
+
+        if sucesso and estado["ids_diario"]:
+            # Se falhar, as entradas continuam marcadas e são ignoradas; saem na próxima compactação
+            try:
+                removido, mensagem_diario = _remover_do_diario(armazenamento, estado["ids_diario"])
+            except Exception as e:
+                removido, mensagem_diario = False, str(e)
+            if not removido:
+                logger.warning("Entradas compactadas continuam no diário: %s", mensagem_diario)
+        return sucesso, mensagem, final if sucesso else None
+
+    return False, "Conflito persistente com outra gravação; recarregue a coleção.", None
+
+def _gravar_no_diario(armazenamento, entradas: pd.DataFrame):
+    # Descarga da fila: todas as entradas pendentes numa única escrita
+    for _ in range(GRAVACAO_TENTATIVAS):
+        diario, versao = _carregar_diario(armazenamento)
+        novo = pd.concat([diario.reindex(columns=COLUNAS_DIARIO), entradas], ignore_index=True)
+        novo = novo.drop_duplicates(subset=["id"], keep="first")
+        try:
+            sucesso, mensagem = armazenamento.alterar(novo, DIARIO_PATH, versao_esperada=versao)
+        except ConflitoDeVersao:
+            continue
+        if not sucesso:
+            return sucesso, mensagem
+        _tamanho_diario[armazenamento.identificador] = len(novo)
+
+        # Passou do limite: dobra o diário no snapshot
+        if (armazenamento.identificador not in _metadados_remotos
+                or len(novo) >= DIARIO_LIMITE_COMPACTACAO):
+            df, _ = _carregar_estado(armazenamento)
+            return salvar_colecao(df, armazenamento)[:2]
+        return sucesso, mensagem
+
+    return False, "Conflito persistente ao gravar o diário."
+
+def _fila(armazenamento) -> FilaDeEscrita:
+    if armazenamento.identificador not in _filas:
+        _filas[armazenamento.identificador] = FilaDeEscrita(lambda entradas: _gravar_no_diario(armazenamento, entradas))
+    return _filas[armazenamento.identificador]
+
+def _enfileirar(armazenamento, operacao, df_entradas: pd.DataFrame):
+    # Uma coluna "id" já presente é mantida: a mesma entrada gravada duas vezes entra uma vez só no diário
+    ids = list(df_entradas["id"]) if "id" in df_entradas else [uuid.uuid4().hex for _ in range(len(df_entradas))]
+    entradas = df_entradas.reindex(columns=CHAVES + COLUNAS_METADADOS + COLUNAS_PRECOS)
+    entradas.insert(0, "operacao", operacao)
+    entradas.insert(0, "registrado_em", pd.Timestamp.now(tz="UTC").isoformat())
+    entradas.insert(0, "id", ids)
+    return _fila(armazenamento).adicionar(entradas)
+
+def descarregar_pendentes(armazenamento):
+    return _fila(armazenamento).descarregar()
+
+def adicionar_cartas(df_novo: pd.DataFrame, armazenamento):
+    # Custo constante: a(s) nova(s) linha(s) entram na fila e depois no diário
+    return _enfileirar(armazenamento, "adicionar", df_novo)
+
+def alterar_quantidades(df_alteradas: pd.DataFrame, armazenamento):
+    return _enfileirar(armazenamento, "quantidade", df_alteradas[CHAVES + ["padrao", "foil"]])
+
+def salvar_edicao(df_original: pd.DataFrame, df_editado: pd.DataFrame, armazenamento):
+    # Se a edição só mudou quantidades de cartas existentes, vai para a fila; senão, snapshot completo.
+    # Devolve (sucesso, mensagem, coleção para a sessão).
+    mesmas_linhas = df_original.index.equals(df_editado.index) and df_original.columns.equals(df_editado.columns)
+    if mesmas_linhas:
+        outras = [c for c in df_editado.columns if c not in ["padrao", "foil"]]
+        if df_original[outras].equals(df_editado[outras]):
+            mudou = (df_original["padrao"] != df_editado["padrao"]) | (df_original["foil"] != df_editado["foil"])
+            if not mudou.any():
+                return True, "Nenhuma alteração.", df_editado
+            return (*alterar_quantidades(df_editado[mudou], armazenamento), df_editado)
+    return salvar_colecao(df_editado, armazenamento, base=df_original)
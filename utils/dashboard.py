@@ -0,0 +1,80 @@
+# Agregações e gráficos do Dashboard: todas as contagens saem de uma passada vetorizada,
+# guardada por versão da coleção + filtros escolhidos, e cada gráfico é um único trace de barras.
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+def agregar_dashboard(df: pd.DataFrame) -> dict:
+    quantidade = df["quantidade_total"]
+
+    # "W, U" conta para as duas cores
+    cores = df["cores"].astype("string").fillna("").str.split(", ")
+    por_cor = (
+        pd.DataFrame({"cor": cores.to_numpy(), "quantidade": quantidade.to_numpy()})
+        .explode("cor")
+        .groupby("cor")["quantidade"].sum()
+    )
+
+    return {
+        "total_padrao": int(df["padrao"].sum()),
+        "total_foil": int(df["foil"].sum()),
+        "valor_total": float(df["valor_total_brl"].sum()),
+        "cores": por_cor.sort_values(),
+        "colecoes": quantidade.groupby(df["colecao_nome"].astype(str)).sum().sort_values(),
+        "mana_valor": quantidade.groupby(df["mana_valor"]).sum().sort_index(),
+        "tipos": quantidade.groupby(df["tipo_sem_traco"]).sum().sort_values(),
+    }
+
+@st.cache_data(max_entries=32)
+def agregacoes_dashboard(_df: pd.DataFrame, versao: str, assinatura_filtros: tuple) -> dict:
+    return agregar_dashboard(_df)
+
+def grafico_barras(contagem: pd.Series, titulo, cores=None, icones=None, altura_barra=None):
+    # Um trace com todas as barras (arrays), em vez de um trace por barra.
+    # `cores`/`icones`: dicionários por rótulo; com ícones, eles substituem os rótulos do eixo.
+    rotulos = [str(rotulo) for rotulo in contagem.index]
+    fig = go.Figure(go.Bar(
+        x=contagem.to_numpy(),
+        y=rotulos,
+        orientation='h',
+        marker=dict(
+            color=[cores.get(rotulo, "#999999") for rotulo in rotulos] if cores else "#D3D3D3",
+            line=dict(width=0)
+        ),
+        text=[str(valor) for valor in contagem.to_numpy()],
+        textposition='outside',
+        cliponaxis=False,
+        insidetextanchor='end',
+        hoverinfo='none',
+        textfont=dict(size=16, color="white")
+    ))
+
+    for rotulo in rotulos if icones else []:
+        fig.add_layout_image(dict(
+            source=icones.get(rotulo),
+            xref="paper",
+            yref="y",
+            x=-0.08,
+            y=rotulo,
+            sizex=0.06,
+            sizey=1.0,  # altura igual à faixa da barra
+            xanchor="left",
+            yanchor="middle",
+            layer="above"
+        ))
+
+    fig.update_layout(
+        title_text=titulo,
+        title_x=0.0,
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white'),
+        xaxis=dict(visible=False, showticklabels=False, showgrid=False, ticks=""),
+        yaxis=dict(showticklabels=not icones, title=None, type="category"),
+        margin=dict(l=100, r=80, t=40, b=30),
+        showlegend=False
+    )
+    if altura_barra:
+        # Altura acompanha o número de barras em vez de um valor fixo
+        fig.update_layout(height=max(450, 80 + altura_barra * len(rotulos)))
+    return fig
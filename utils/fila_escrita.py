@@ -0,0 +1,69 @@
+# Fila de gravação: junta alterações pendentes e as grava numa única escrita,
+# quando a fila atinge `limite` entradas ou `intervalo` segundos depois da primeira pendência
+import atexit
+import logging
+import threading
+import pandas as pd
+from config import FILA_LIMITE, FILA_INTERVALO
+
+logger = logging.getLogger(__name__)
+
+class FilaDeEscrita:
+    def __init__(self, descarregar, limite=FILA_LIMITE, intervalo=FILA_INTERVALO):
+        self._funcao_descarga = descarregar
+        self.limite = limite
+        self.intervalo = intervalo
+        self._pendentes = []
+        self._lock = threading.Lock()
+        self._lock_descarga = threading.RLock()
+        self._timer = None
+        atexit.register(self.descarregar)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(p) for p in self._pendentes)
+
+    def adicionar(self, df_entradas: pd.DataFrame):
+        with self._lock:
+            self._pendentes.append(df_entradas)
+            cheia = sum(len(p) for p in self._pendentes) >= self.limite
+            if not cheia and self._timer is None:
+                self._timer = threading.Timer(self.intervalo, self._descarregar_no_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if cheia:
+            return self.descarregar()
+        return True, "Alteração na fila de gravação."
+
+    def _descarregar_no_timer(self):
+        sucesso, mensagem = self.descarregar()
+        if not sucesso:
+            logger.error("Falha ao gravar a fila: %s", mensagem)
+
+    def descarregar(self):
+        # Uma descarga por vez; novas entradas continuam entrando na fila enquanto isso
+        with self._lock_descarga:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                lote, self._pendentes = self._pendentes, []
+
+            if not lote:
+                return True, "Nada pendente."
+
+            try:
+                sucesso, mensagem = self._funcao_descarga(pd.concat(lote, ignore_index=True))
+            except Exception as e:
+                sucesso, mensagem = False, str(e)
+
+            if not sucesso:
+                # Devolve o lote para a frente da fila e tenta de novo mais tarde
+                with self._lock:
+                    self._pendentes = lote + self._pendentes
+                    if self._timer is None:
+                        self._timer = threading.Timer(self.intervalo, self._descarregar_no_timer)
+                        self._timer.daemon = True
+                        self._timer.start()
+            return sucesso, mensagem
@@ -0,0 +1,124 @@
+# Filtros da coleção compartilhados por Collection e Dashboard.
+# Para cada dimensão (set, cor, raridade, tipo, acabamento) guarda as posições das linhas de cada valor,
+# calculadas uma vez por versão do df; combinar filtros vira interseção de máscaras.
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.busca import indice_nomes, registrar_colecao
+
+def _posicoes_por_valor(valores: pd.Series, posicoes: np.ndarray) -> dict:
+    # valor -> posições (ordenadas) das linhas que têm esse valor
+    indices = pd.Series(posicoes).groupby(valores.to_numpy(), observed=True, sort=True).indices
+    return {valor: posicoes[idx] for valor, idx in indices.items()}
+
+def construir_indice(df: pd.DataFrame) -> dict:
+    posicoes = np.arange(len(df))
+
+    # Cores: "W, U" vira duas entradas; comparação exata por símbolo
+    cores = pd.DataFrame({
+        "pos": posicoes,
+        "cor": df["cores"].astype("string").fillna("").str.split(",").to_numpy()
+    }).explode("cor")
+    cores["cor"] = cores["cor"].str.strip()
+    cores = cores[cores["cor"].notna() & (cores["cor"] != "")]
+
+    padrao = pd.to_numeric(df["padrao"], errors="coerce").fillna(0).to_numpy() > 0
+    foil = pd.to_numeric(df["foil"], errors="coerce").fillna(0).to_numpy() > 0
+
+    valores = df["colecao"].notna().to_numpy()
+    com_tipo = (df["tipo_sem_traco"].fillna("") != "").to_numpy()
+    return {
+        "tamanho": len(df),
+        "colecao": _posicoes_por_valor(df["colecao"][valores].astype(str), posicoes[valores]),
+        "cores": _posicoes_por_valor(cores["cor"], cores["pos"].to_numpy()),
+        "raridade": _posicoes_por_valor(df["raridade"].dropna().astype(str), posicoes[df["raridade"].notna().to_numpy()]),
+        "tipo": _posicoes_por_valor(df["tipo_sem_traco"][com_tipo], posicoes[com_tipo]),
+        "acabamento": {"regular": posicoes[padrao], "foil": posicoes[foil]},
+        "nome": indice_nomes().ids_de(df["nome"]),
+        "nome_2": indice_nomes().ids_de(df["nome_2"]) if "nome_2" in df else np.full(len(df), -1),
+        "valor": pd.to_numeric(df["valor_medio_por_carta"], errors="coerce").to_numpy(dtype=float),
+    }
+
+@st.cache_data(max_entries=8)
+def indice_filtros(_df: pd.DataFrame, versao: str) -> dict:
+    registrar_colecao(_df, versao)
+    return construir_indice(_df)
+
+def mascara_valores(indice: dict, dimensao: str, valores) -> np.ndarray:
+    # Linhas com qualquer um dos valores (união dentro da dimensão)
+    mascara = np.zeros(indice["tamanho"], dtype=bool)
+    for valor in valores:
+        mascara[indice[dimensao].get(valor, [])] = True
+    return mascara
+
+def opcoes(indice: dict, dimensao: str, mascara: np.ndarray) -> list:
+    # Valores que ainda aparecem entre as linhas já filtradas
+    return [valor for valor, posicoes in indice[dimensao].items() if mascara[posicoes].any()]
+
+def mascara_nome(indice: dict, busca: str) -> np.ndarray:
+    # Busca aproximada no índice de trigramas (tolera erros de digitação), nas duas faces
+    encontrados = [id_nome for id_nome, _ in indice_nomes().buscar(busca)]
+    return np.isin(indice["nome"], encontrados) | np.isin(indice["nome_2"], encontrados)
+
+def filtros_na_sidebar(df: pd.DataFrame, colecao_map: dict, versao: str):
+    # Desenha os filtros e devolve (df filtrado, assinatura dos filtros escolhidos)
+    indice = indice_filtros(df, versao)
+    mascara = np.ones(indice["tamanho"], dtype=bool)
+
+    colecao_opcoes = list(indice["colecao"])
+    colecao_labels = ["All"] + [colecao_map[c]["nome"] for c in colecao_opcoes]
+    colecao_escolhida_label = st.sidebar.multiselect("Collection", colecao_labels, default=["All"])
+    if "All" not in colecao_escolhida_label:
+        colecao_escolhida = [c for c in colecao_opcoes if colecao_map[c]["nome"] in colecao_escolhida_label]
+        mascara &= mascara_valores(indice, "colecao", colecao_escolhida)
+
+    cor_escolhida = st.sidebar.multiselect("Cor", ["All"] + opcoes(indice, "cores", mascara), default=["All"])
+    if "All" not in cor_escolhida:
+        mascara &= mascara_valores(indice, "cores", cor_escolhida)
+
+    raridade_escolhida = st.sidebar.multiselect("Rarity", ["All"] + opcoes(indice, "raridade", mascara), default=["All"])
+    if "All" not in raridade_escolhida:
+        mascara &= mascara_valores(indice, "raridade", raridade_escolhida)
+
+    # Filtro por nome da carta
+    nome_busca = st.sidebar.text_input("Search by card name")
+    if nome_busca:
+        mascara &= mascara_nome(indice, nome_busca)
+
+    # Filtro por tipo (sem os subtipos depois do traço)
+    tipo_escolhido = st.sidebar.multiselect("Card Type", ["All"] + opcoes(indice, "tipo", mascara), default=["All"])
+    if "All" not in tipo_escolhido:
+        mascara &= mascara_valores(indice, "tipo", tipo_escolhido)
+
+    # Filtro por valor
+    valores = indice["valor"][mascara]
+    valor_maximo = float(np.nanmax(valores)) if np.isfinite(valores).any() else 0.0
+    if valor_maximo == 0.0:
+        valor_maximo = 1.0  # fallback seguro
+    valor_min, valor_max = st.sidebar.slider(
+        "Card Value (BRL)",
+        0.0,
+        valor_maximo,
+        (0.0, valor_maximo)
+    )
+
+    # Corrige caso os valores sejam iguais
+    if valor_min == valor_max:
+        valor_max += 1.0
+
+    with np.errstate(invalid="ignore"):
+        mascara &= (indice["valor"] >= valor_min) & (indice["valor"] <= valor_max)
+
+    # Filtro por tipo de posse
+    opcoes_posse = ["All", "Only Regular", "Only Foil", "Both"]
+    posse_escolhida = st.sidebar.selectbox("Face Type", opcoes_posse)
+    if posse_escolhida in ["Only Regular", "Both"]:
+        mascara &= mascara_valores(indice, "acabamento", ["regular"])
+    if posse_escolhida in ["Only Foil", "Both"]:
+        mascara &= mascara_valores(indice, "acabamento", ["foil"])
+
+    assinatura = (
+        tuple(colecao_escolhida_label), tuple(cor_escolhida), tuple(raridade_escolhida), nome_busca,
+        tuple(tipo_escolhido), valor_min, valor_max, posse_escolhida
+    )
+    return df[mascara], assinatura
@@ -1,102 +1,212 @@
-import requests, base64, pandas as pd
+import requests, base64, hashlib, json, os, threading, pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 import streamlit as st
-from config import CSV_PATH, REPO, GITHUB_TOKEN, TTL
+from config import CSV_PATH, REPO, TTL, GITHUB_DOWNLOADS_SIMULTANEOS, GITHUB_CACHE_PATH, GITHUB_CACHE_LIMITE_MB
+from utils.cache_disco import limitar_pasta
 
-def carregar_csv_do_github(repo, path, token):
-    import base64, requests, pandas as pd
-    from io import StringIO
-
-    url = f"https://api.github.com/repos/{repo}/contents/{path}"
-    headers = {"Authorization": f"token {token}"}
-
-    r = requests.get(url, headers=headers)
-    if r.status_code == 200:
-        conteudo_base64 = r.json()["content"]
-        conteudo_csv = base64.b64decode(conteudo_base64).decode()
-        return pd.read_csv(StringIO(conteudo_csv))
-    else:
-        raise Exception(f"Erro ao carregar CSV do GitHub: {r.status_code} - {r.text}")
-
-def salvar_csv_em_github(df_novo, repo, path, token):
-    import base64, requests, pandas as pd
-    from io import StringIO
+BRANCH = "main"
+ERRO_CONFLITO = "conflito"  # mensagem devolvida quando o branch mudou entre a leitura e a escrita
 
-    url = f"https://api.github.com/repos/{repo}/contents/{path}"
-    headers = {"Authorization": f"token {token}"}
+_lock_cache = threading.Lock()
+_tamanho_cache = None  # bytes dos pickles, varrido na primeira gravação e somado a cada nova
 
-    # Verifica se o arquivo já existe
-    r_get = requests.get(url, headers=headers)
-    if r_get.status_code == 200:
-        conteudo_atual = base64.b64decode(r_get.json()["content"]).decode()
-        sha = r_get.json()["sha"]
-        try:
-            df_atual = pd.read_csv(StringIO(conteudo_atual))
-        except Exception as e:
-            return False, f"Erro ao ler CSV existente: {e}"
+# Cache local de leituras: respostas JSON com ETag (para If-None-Match) e DataFrames já
+# interpretados, guardados em pickle pelo SHA do blob (imutável). Cada gravação gera SHAs novos,
+# então os pickles usados há mais tempo são removidos quando o cache passa do limite (LRU por mtime).
 
-        # Remove duplicatas com base em colunas-chave (ajuste conforme necessário)
-        df_final = pd.concat([df_atual, df_novo], ignore_index=True).drop_duplicates()
-    else:
-        sha = None
-        df_final = df_novo
+def _arquivo_cache(nome):
+    os.makedirs(GITHUB_CACHE_PATH, exist_ok=True)
+    return os.path.join(GITHUB_CACHE_PATH, nome)
 
-    # Prepara conteúdo para upload
+def _get_condicional(url, headers):
+    # Devolve (status, json). Num 304 o corpo vem do cache e não gasta limite da API.
+    arquivo = _arquivo_cache(hashlib.sha1(url.encode()).hexdigest() + ".json")
     try:
-        conteudo_csv = df_final.to_csv(index=False)
-        conteudo_base64 = base64.b64encode(conteudo_csv.encode()).decode()
-    except Exception as e:
-        return False, f"Erro ao converter DataFrame para CSV: {e}"
-
-    data = {
-        "message": "Atualização incremental via Streamlit",
-        "content": conteudo_base64,
-        "branch": "main"
-    }
-    if sha:
-        data["sha"] = sha
-
-    r_put = requests.put(url, headers=headers, json=data)
-
-    if r_put.status_code in [200, 201]:
-        return True, "Arquivo salvo com sucesso!"
-    else:
-        try:
-            erro = r_put.json().get("message", "Erro desconhecido")
-        except Exception:
-            erro = "Erro ao decodificar resposta da API"
-        return False, erro
-
+        with open(arquivo, encoding="utf-8") as f:
+            cache = json.load(f)
+        headers = {**headers, "If-None-Match": cache["etag"]}
+    except (OSError, ValueError, KeyError):
+        cache = None
 
-def alterar_csv_em_github(df_novo, repo, path, token):
-    import base64, requests
+    r = requests.get(url, headers=headers)
+    if r.status_code == 304 and cache is not None:
+        return 200, cache["corpo"]
+    if r.status_code != 200:
+        return r.status_code, r.text
+
+    dados = r.json()
+    if r.headers.get("ETag"):
+        # O conteúdo em si não vai para o JSON: fica no cache de DataFrames, pelo SHA
+        corpo = {k: v for k, v in dados.items() if k != "content"} if isinstance(dados, dict) else dados
+        temporario = arquivo + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"etag": r.headers["ETag"], "corpo": corpo}, f)
+        os.replace(temporario, arquivo)
+    return 200, dados
+
+def _df_do_cache(sha):
+    caminho = _arquivo_cache(f"{sha}.pkl")
+    try:
+        df = pd.read_pickle(caminho)
+        os.utime(caminho)  # marca como usado recentemente
+        return df
+    except (OSError, ValueError, EOFError):
+        return None
+
+def _limitar_cache_dfs(adicionados: int):
+    global _tamanho_cache
+    limite = GITHUB_CACHE_LIMITE_MB * 1024 * 1024
+    with _lock_cache:
+        if _tamanho_cache is not None:
+            _tamanho_cache += adicionados
+        if _tamanho_cache is None or _tamanho_cache > limite:
+            _tamanho_cache = limitar_pasta(GITHUB_CACHE_PATH, limite, ".pkl")
+
+def _guardar_df_no_cache(sha, df):
+    temporario = _arquivo_cache(f"{sha}.pkl.{threading.get_ident()}.tmp")
+    df.to_pickle(temporario)
+    adicionados = os.path.getsize(temporario)
+    os.replace(temporario, _arquivo_cache(f"{sha}.pkl"))
+    _limitar_cache_dfs(adicionados)
 
+def carregar_csv_do_github(repo, path, token):
     url = f"https://api.github.com/repos/{repo}/contents/{path}"
     headers = {"Authorization": f"token {token}"}
 
-    # Verifica se o arquivo já existe para obter o SHA
-    r_get = requests.get(url, headers=headers)
-    sha = r_get.json()["sha"] if r_get.status_code == 200 else None
+    status, dados = _get_condicional(url, headers)
+    if status == 200:
+        df = _df_do_cache(dados["sha"])
+        if df is not None:
+            return df
+        conteudo_base64 = dados.get("content")
+        if not conteudo_base64:
+            # Acima de 1 MB a Contents API não devolve o conteúdo; busca o blob pelo SHA
+            return carregar_df_do_blob(repo, dados["sha"], token)
+        df = pd.read_csv(StringIO(base64.b64decode(conteudo_base64).decode()))
+        _guardar_df_no_cache(dados["sha"], df)
+        return df
+    elif status == 404:
+        raise FileNotFoundError(path)
+    else:
+        raise Exception(f"Erro ao carregar CSV do GitHub: {status} - {dados}")
+
+# Coleção fragmentada: cada tabela vira uma pasta de CSVs menores, gravados via Git Data API
 
-    # Prepara conteúdo para upload
-    conteudo_csv = df_novo.to_csv(index=False)
-    conteudo_base64 = base64.b64encode(conteudo_csv.encode()).decode()
+def carregar_blob_do_github(repo, sha, token):
+    # Blobs são imutáveis: quem chama guarda o DataFrame no cache em disco pelo SHA
+    url = f"https://api.github.com/repos/{repo}/git/blobs/{sha}"
+    headers = {"Authorization": f"token {token}"}
 
-    data = {
-        "message": "Substituição completa via Streamlit",
-        "content": conteudo_base64,
-        "branch": "main"
-    }
-    if sha:
-        data["sha"] = sha
+    r = requests.get(url, headers=headers)
+    if r.status_code == 200:
+        return base64.b64decode(r.json()["content"]).decode()
+    else:
+        raise Exception(f"Erro ao carregar blob do GitHub: {r.status_code} - {r.text}")
+
+def sha_blob_git(conteudo: str) -> str:
+    # Mesmo SHA que o Git calcula, para comparar com o remoto sem baixar nada
+    dados = conteudo.encode()
+    return hashlib.sha1(b"blob %d\0" % len(dados) + dados).hexdigest()
+
+def carregar_df_do_blob(repo, sha, token):
+    df = _df_do_cache(sha)
+    if df is None:
+        conteudo = carregar_blob_do_github(repo, sha, token)
+        df = pd.read_csv(StringIO(conteudo)) if conteudo.strip() else pd.DataFrame()
+        _guardar_df_no_cache(sha, df)
+    return df
+
+def commit_do_branch(repo, token):
+    # SHA do commit atual do branch, para listar e gravar a partir exatamente dele
+    r = requests.get(f"https://api.github.com/repos/{repo}/git/ref/heads/{BRANCH}", headers={"Authorization": f"token {token}"})
+    if r.status_code != 200:
+        raise Exception(f"Erro ao ler branch: {r.status_code} - {r.text}")
+    return r.json()["object"]["sha"]
+
+def listar_fragmentos_do_github(repo, pasta, token, ref=BRANCH):
+    url = f"https://api.github.com/repos/{repo}/contents/{pasta}?ref={ref}"
+    headers = {"Authorization": f"token {token}"}
 
-    r_put = requests.put(url, headers=headers, json=data)
+    status, dados = _get_condicional(url, headers)
+    if status == 404:
+        raise FileNotFoundError(pasta)
+    if status != 200:
+        raise Exception(f"Erro ao listar fragmentos no GitHub: {status} - {dados}")
+    return {item["name"]: item["sha"] for item in dados if item["type"] == "file" and item["name"].endswith(".csv")}
+
+def versao_dos_fragmentos(fragmentos: dict) -> str:
+    # Muda sempre que algum fragmento da pasta muda
+    return hashlib.sha1("".join(f"{nome}:{sha};" for nome, sha in sorted(fragmentos.items())).encode()).hexdigest()
+
+def carregar_fragmentos_do_github(repo, pasta, token, fragmentos=None):
+    if fragmentos is None:
+        fragmentos = listar_fragmentos_do_github(repo, pasta, token)
+
+    # Fragmentos baixados em paralelo; os que já estão no cache local nem vão para a rede
+    with ThreadPoolExecutor(max_workers=GITHUB_DOWNLOADS_SIMULTANEOS) as executor:
+        partes = list(executor.map(lambda sha: carregar_df_do_blob(repo, sha, token), fragmentos.values()))
+
+    partes = [parte for parte in partes if len(parte.columns)]
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+
+def salvar_fragmentos_em_github(fragmentos: dict, repo, pasta, token, mensagem="Atualização via Streamlit",
+                                remotos=None, commit_pai=None):
+    # fragmentos: nome do arquivo -> conteúdo CSV. Só os que mudaram entram no commit.
+    # `commit_pai`: commit de onde `remotos` foi listado. O novo commit parte dele, então outro commit
+    # que entre no branch nesse meio tempo faz o PATCH falhar (não é fast-forward) em vez de ser sobrescrito.
+    headers = {"Authorization": f"token {token}"}
+    base = f"https://api.github.com/repos/{repo}/git"
 
-    if r_put.status_code in [200, 201]:
-        return True, "Arquivo salvo com sucesso!"
+    if commit_pai is None:
+        try:
+            commit_pai = commit_do_branch(repo, token)
+        except Exception as e:
+            return False, str(e)
+    if remotos is None:
+        try:
+            remotos = listar_fragmentos_do_github(repo, pasta, token, ref=commit_pai)
+        except FileNotFoundError:
+            remotos = {}
+
+    entradas = [
+        {"path": f"{pasta}/{nome}", "mode": "100644", "type": "blob", "content": conteudo}
+        for nome, conteudo in fragmentos.items()
+        if remotos.get(nome) != sha_blob_git(conteudo)
+    ]
+    entradas += [
+        {"path": f"{pasta}/{nome}", "mode": "100644", "type": "blob", "sha": None}
+        for nome in remotos if nome not in fragmentos
+    ]
+    if not entradas:
+        return True, "Nenhum fragmento alterado."
+
+    r_pai = requests.get(f"{base}/commits/{commit_pai}", headers=headers)
+    if r_pai.status_code != 200:
+        return False, f"Erro ao ler commit {commit_pai}: {r_pai.status_code}"
+    arvore_pai = r_pai.json()["tree"]["sha"]
+
+    r_arvore = requests.post(f"{base}/trees", headers=headers, json={"base_tree": arvore_pai, "tree": entradas})
+    if r_arvore.status_code != 201:
+        return False, r_arvore.json().get("message", "Erro ao criar árvore")
+
+    r_commit = requests.post(f"{base}/commits", headers=headers, json={
+        "message": mensagem,
+        "tree": r_arvore.json()["sha"],
+        "parents": [commit_pai]
+    })
+    if r_commit.status_code != 201:
+        return False, r_commit.json().get("message", "Erro ao criar commit")
+
+    r_put = requests.patch(f"{base}/refs/heads/{BRANCH}", headers=headers, json={"sha": r_commit.json()["sha"], "force": False})
+    if r_put.status_code == 200:
+        return True, f"{len(entradas)} fragmento(s) salvo(s) com sucesso!"
+    elif r_put.status_code in [409, 422]:
+        # Outro commit entrou no branch depois da leitura
+        return False, ERRO_CONFLITO
     else:
         try:
             erro = r_put.json().get("message", "Erro desconhecido")
         except Exception:
             erro = "Erro ao decodificar resposta da API"
-        return False, erro
\ No newline at end of file
+        return False, erro
@@ -1,11 +1,10 @@
+import re
+import uuid
+import numpy as np
 import streamlit as st
 import pandas as pd
 from config import TTL
 
-def dividir_em_lotes(lista, tamanho):
-    for i in range(0, len(lista), tamanho):
-        yield lista[i:i + tamanho]
-
 def gerar_icones(valores, mapa):
     icones = []
     for v in str(valores).split(","):
@@ -32,28 +31,54 @@ def preparar_dataframe(df: pd.DataFrame) -> pd.DataFrame:
 
     return df
 
+def somar_quantidades(df: pd.DataFrame, novas: pd.DataFrame) -> pd.DataFrame:
+    # Junta por (colecao, numero) com um índice de hash: chaves que já existem somam padrao/foil
+    # (o resto da linha existente é mantido) e chaves novas entram como linhas novas
+    chaves = ["colecao", "numero"]
+    if novas.empty:
+        return df
+    novas = novas.assign(colecao=novas["colecao"].astype(str).str.lower(), numero=novas["numero"].astype(str))
+    novas = novas.groupby(chaves, as_index=False, sort=False).agg({
+        "padrao": "sum",
+        "foil": "sum",
+        **{col: "first" for col in novas.columns if col not in chaves + ["padrao", "foil"]}
+    })
+    base = df.assign(colecao=df["colecao"].astype(str), numero=df["numero"].astype(str)).reset_index(drop=True)
+
+    posicoes = pd.MultiIndex.from_frame(base[chaves]).get_indexer(pd.MultiIndex.from_frame(novas[chaves]))
+    existentes = posicoes >= 0
+    tocadas = np.zeros(len(base), dtype=bool)
+    tocadas[posicoes[existentes]] = True
+    for coluna in ["padrao", "foil"]:
+        somas = np.zeros(len(base))
+        np.add.at(somas, posicoes[existentes], pd.to_numeric(novas[coluna], errors="coerce").fillna(0).to_numpy()[existentes])
+        atuais = pd.to_numeric(base[coluna], errors="coerce").to_numpy(dtype=float)
+        base[coluna] = np.where(tocadas, np.nan_to_num(atuais) + somas, atuais)
+
+    return pd.concat([base, novas[~existentes]], ignore_index=True)
+
+def _para_inteiro(serie: pd.Series) -> pd.Series:
+    return pd.to_numeric(serie, errors="coerce").replace([float("inf"), float("-inf")], 0).fillna(0).astype("int32")
+
 def limpar_e_enriquecer_dataframe(df: pd.DataFrame) -> tuple[pd.DataFrame, dict]:
-    # Corrigir coluna "cores" com base no tipo
-    df["cores"] = df.apply(
-        lambda row: "L" if "Land" in str(row["tipo"]) else (
-            "C" if pd.isna(row["cores"]) or str(row["cores"]).strip() == "" else row["cores"]
-        ),
-        axis=1
-    )
+    df = df.copy()
 
-    # Conversões e limpeza
-    df = df.astype(str)
-    df["mana_cost"] = df["mana_cost"].astype(str)
-    df["mana_cost"] = df["mana_cost"].str.replace("nan", "", regex=False)
-    df["mana_cost"] = df["mana_cost"].str.replace("//", "/", regex=False)
-    df["mana_cost"] = df["mana_cost"].str.replace("{", "", regex=False)
-    df["mana_cost"] = df["mana_cost"].str.replace("}", "", regex=False)
+    # Corrigir coluna "cores" com base no tipo (máscaras vetorizadas)
+    eh_terreno = df["tipo"].astype("string").str.contains("Land", regex=False).fillna(False).astype(bool)
+    cores = df["cores"].astype("string").str.strip()
+    sem_cor = cores.isna() | (cores == "")
+    df["cores"] = cores.mask(sem_cor, "C").mask(eh_terreno, "L")
 
-    df["padrao"] = pd.to_numeric(df["padrao"], errors="coerce").fillna(0).replace([float("inf"), float("-inf")], 0).astype(int)
-    df["foil"] = pd.to_numeric(df["foil"], errors="coerce").fillna(0).replace([float("inf"), float("-inf")], 0).astype(int)
+    # Conversões e limpeza só nas colunas que precisam
+    df["numero"] = df["numero"].astype(str)
+    # Custo de mana analisado uma vez: valor de mana, pips por cor e lista de símbolos
+    df = pd.concat([df.drop(columns=COLUNAS_MANA, errors="ignore"), analisar_custos_mana(df["mana_cost"])], axis=1)
+
+    df["padrao"] = _para_inteiro(df["padrao"])
+    df["foil"] = _para_inteiro(df["foil"])
 
-    df["preco_brl"] = df["preco_brl"].replace("nan", "0").astype(float)
-    df["preco_brl_foil"] = df["preco_brl_foil"].replace("nan", "0").astype(float)
+    df["preco_brl"] = pd.to_numeric(df["preco_brl"], errors="coerce").fillna(0).astype(float)
+    df["preco_brl_foil"] = pd.to_numeric(df["preco_brl_foil"], errors="coerce").fillna(0).astype(float)
 
     # Valor total
     df["valor_total_brl"] = (
@@ -62,16 +87,90 @@ def limpar_e_enriquecer_dataframe(df: pd.DataFrame) -> tuple[pd.DataFrame, dict]
     )
 
     # Mapeamento de coleções
-    colecao_map = {
-        row["colecao"]: {
-            "nome": row["colecao_nome"],
-            "icone": row["icone_colecao"]
-        }
-        for _, row in df.drop_duplicates(subset=["colecao"]).iterrows()
-    }
+    df["colecao"] = df["colecao"].astype(str)
+    colecoes = df[["colecao", "colecao_nome", "icone_colecao"]].drop_duplicates(subset=["colecao"])
+    colecoes["colecao_nome"] = colecoes["colecao_nome"].fillna(colecoes["colecao"])
+    colecao_map = (
+        colecoes.set_index("colecao")
+        .rename(columns={"colecao_nome": "nome", "icone_colecao": "icone"})
+        .to_dict("index")
+    )
+
+    # Tipos compactos para as colunas de baixa cardinalidade
+    for coluna in ["colecao", "raridade", "cores"]:
+        df[coluna] = df[coluna].astype("category")
+
+    return df, colecao_map
+
+CORES_MANA = ["W", "U", "B", "R", "G", "C"]
+COLUNAS_MANA = ["mana_valor"] + [f"pips_{cor}" for cor in CORES_MANA] + ["mana_simbolos"]
+_SIMBOLO_MANA = re.compile(r"\{([^}]+)\}")
+
+def _analisar_custo(custo: str) -> list:
+    # "{2}{W/U}{G/P}" -> [valor de mana, pips W..C, "2,W/U,G/P"]
+    simbolos = _SIMBOLO_MANA.findall(custo)
+    valor = 0.0
+    pips = dict.fromkeys(CORES_MANA, 0)
+    for simbolo in simbolos:
+        partes = simbolo.split("/")
+        if simbolo.isdigit():
+            valor += int(simbolo)
+        elif simbolo.startswith("H"):
+            valor += 0.5  # meia mana, ex.: {HW}
+            partes = [simbolo[1:]]
+        elif partes[0].isdigit():
+            valor += int(partes[0])  # híbrido com genérico, ex.: {2/W}, conta o maior
+        elif simbolo not in ["X", "Y", "Z"]:
+            valor += 1  # colorido, híbrido ({W/U}) e phyrexiano ({W/P}) valem 1
+        for parte in partes:
+            if parte in pips:
+                pips[parte] += 1
+    return [valor] + list(pips.values()) + [",".join(simbolos)]
+
+def analisar_custos_mana(custos: pd.Series) -> pd.DataFrame:
+    # Cada custo distinto é analisado uma única vez e o resultado é espalhado pelos códigos
+    codigos, unicos = pd.factorize(custos.fillna("").astype(str))
+    tabela = pd.DataFrame([_analisar_custo(custo) for custo in unicos], columns=COLUNAS_MANA)
+    resultado = tabela.iloc[codigos].set_axis(custos.index)
+    return resultado.astype({
+        "mana_valor": "float32",
+        **{f"pips_{cor}": "int8" for cor in CORES_MANA},
+        "mana_simbolos": str
+    })
+
+def definir_df_sessao(df: pd.DataFrame):
+    # Toda troca do df da sessão gera uma nova versão, que invalida o cache de preparar_colecao
+    st.session_state["df"] = df
+    st.session_state["df_versao"] = uuid.uuid4().hex
+
+def versao_df_sessao() -> str:
+    if "df_versao" not in st.session_state:
+        st.session_state["df_versao"] = uuid.uuid4().hex
+    return st.session_state["df_versao"]
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def preparar_colecao(_df: pd.DataFrame, versao: str) -> tuple[pd.DataFrame, dict]:
+    # Calculado uma vez por versão do df; os filtros só recortam o resultado
+    df, colecao_map = limpar_e_enriquecer_dataframe(_df)
+
+    df["quantidade_total"] = df["padrao"] + df["foil"]
+    df["valor_medio_por_carta"] = df["valor_total_brl"] / df["quantidade_total"].replace(0, 1)
+    # Tipo antes do em dash (—) ou en dash (–)
+    df["tipo_sem_traco"] = df["tipo"].fillna("").str.split(r"—|–", regex=True).str[0].str.strip()
 
     return df, colecao_map
 
+def icone_valor_mana(valor: float):
+    # SVG da Scryfall para um valor de mana: 0.5 é o símbolo "HALF" e inteiros vão sem casas decimais
+    # nem notação científica (ex.: 1000000); outras frações não têm símbolo
+    if valor == 0.5:
+        simbolo = "HALF"
+    elif float(valor).is_integer():
+        simbolo = str(int(valor))
+    else:
+        return None
+    return f"https://svgs.scryfall.io/card-symbols/{simbolo}.svg"
+
 def get_mana_map() -> dict:
     return {
         "W": "https://svgs.scryfall.io/card-symbols/W.svg",
@@ -117,6 +216,7 @@ def get_mana_map() -> dict:
         "A": "https://svgs.scryfall.io/card-symbols/A.svg",
         "CHAOS": "https://svgs.scryfall.io/card-symbols/CHAOS.svg",
         "PW": "https://svgs.scryfall.io/card-symbols/PW.svg",
+        **{str(n): f"https://svgs.scryfall.io/card-symbols/{n}.svg" for n in range(21)},
     }
 
 def autenticar():
@@ -127,35 +227,51 @@ def autenticar():
     elif senha_digitada:
         st.error("Wrong password.")
 
+COLUNAS_DETALHES = [
+    "nome", "mana_cost", "cores", "imagem", "nome_2", "imagem_2", "colecao_nome",
+    "icone_colecao", "raridade", "tipo", "preco_brl", "preco_brl_foil"
+]
+
+def _registro_detalhes(carta: dict) -> dict:
+    faces = carta.get("card_faces", [])
+    face1 = faces[0] if faces else carta
+    face2 = faces[1] if len(faces) > 1 else {}
+    precos = carta.get("prices", {})
+
+    return {
+        "colecao": carta["set"],
+        "numero": carta["collector_number"],
+        "nome": face1.get("name"),
+        "mana_cost": face1.get("mana_cost"),
+        "cores": ", ".join(face1.get("colors", [])),
+        "imagem": face1.get("image_uris", {}).get("normal") or carta.get("image_uris", {}).get("normal"),
+        "nome_2": face2.get("name"),
+        "imagem_2": face2.get("image_uris", {}).get("normal"),
+        "colecao_nome": carta.get("set_name"),
+        "icone_colecao": carta.get("set_icon_svg_uri"),
+        "raridade": carta.get("rarity"),
+        "tipo": carta.get("type_line"),
+        "preco_usd": precos.get("usd"),
+        "preco_usd_foil": precos.get("usd_foil")
+    }
+
 def extrair_detalhes_cartas(df: pd.DataFrame, todos_detalhes: list, cotacao: float) -> pd.DataFrame:
-    detalhes_dict = {}
-
-    for carta in todos_detalhes:
-        preco_usd = float(carta.get("prices", {}).get("usd") or 0)
-        preco_foil = float(carta.get("prices", {}).get("usd_foil") or 0)
-        preco_brl = round(preco_usd * cotacao, 2)
-        preco_brl_foil = round(preco_foil * cotacao, 2)
-        faces = carta.get("card_faces", [])
-        face1 = faces[0] if faces else carta
-        face2 = faces[1] if len(faces) > 1 else {}
-
-        detalhes_dict[(carta["set"], carta["collector_number"])] = {
-            "nome": face1.get("name"),
-            "mana_cost": face1.get("mana_cost"),
-            "cores": ", ".join(face1.get("colors", [])),
-            "imagem": face1.get("image_uris", {}).get("normal") or carta.get("image_uris", {}).get("normal"),
-            "nome_2": face2.get("name"),
-            "imagem_2": face2.get("image_uris", {}).get("normal"),
-            "colecao_nome": carta.get("set_name"),
-            "icone_colecao": carta.get("set_icon_svg_uri"),
-            "raridade": carta.get("rarity"),
-            "tipo": carta.get("type_line"),
-            "preco_brl": preco_brl,
-            "preco_brl_foil": preco_brl_foil
-        }
-
-    # Atualiza as colunas diretamente
-    for coluna in list(detalhes_dict.values())[0].keys():
-        df[coluna] = df.apply(lambda linha: detalhes_dict.get((linha["colecao"], linha["numero"]), {}).get(coluna), axis=1)
+    # Um único DataFrame com o payload da Scryfall, unido à coleção por (colecao, numero)
+    detalhes = pd.DataFrame(
+        [_registro_detalhes(carta) for carta in todos_detalhes],
+        columns=["colecao", "numero", *COLUNAS_DETALHES[:-2], "preco_usd", "preco_usd_foil"]
+    )
+    # Chaves comparadas como texto dos dois lados: números de coleção só com dígitos podem vir como int
+    detalhes = detalhes.astype({"colecao": str, "numero": str}).drop_duplicates(subset=["colecao", "numero"], keep="last")
 
-    return df
+    # Conversão para BRL em um passo vetorizado
+    detalhes["preco_brl"] = (pd.to_numeric(detalhes["preco_usd"], errors="coerce").fillna(0) * cotacao).round(2)
+    detalhes["preco_brl_foil"] = (pd.to_numeric(detalhes["preco_usd_foil"], errors="coerce").fillna(0) * cotacao).round(2)
+    detalhes = detalhes.drop(columns=["preco_usd", "preco_usd_foil"])
+
+    base = df.drop(columns=[c for c in COLUNAS_DETALHES if c in df.columns])
+    resultado = base.astype({"colecao": str, "numero": str}).merge(detalhes, on=["colecao", "numero"], how="left")
+    resultado.index = df.index
+    resultado[["colecao", "numero"]] = df[["colecao", "numero"]]  # devolve as chaves com o tipo original
+
+    return resultado
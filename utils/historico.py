@@ -0,0 +1,64 @@
+# Histórico de preços: um snapshot Parquet por dia, particionado por mês (historico_precos/mes=AAAA-MM/AAAA-MM-DD.parquet)
+import functools
+import os
+from glob import glob
+import pandas as pd
+from config import HISTORICO_PATH
+
+COLUNAS_SNAPSHOT = ["colecao", "numero", "padrao", "foil", "preco_brl", "preco_brl_foil"]
+
+def registrar_snapshot(df: pd.DataFrame, data=None, caminho=HISTORICO_PATH) -> str:
+    # Um arquivo por dia: rodar o refresh duas vezes no mesmo dia só substitui o snapshot
+    data = pd.Timestamp(data or pd.Timestamp.now(tz="UTC")).date()
+    snapshot = pd.DataFrame({
+        "colecao": df["colecao"].astype(str),
+        "numero": df["numero"].astype(str),
+        "padrao": pd.to_numeric(df["padrao"], errors="coerce").fillna(0).astype("int32"),
+        "foil": pd.to_numeric(df["foil"], errors="coerce").fillna(0).astype("int32"),
+        "preco_brl": pd.to_numeric(df["preco_brl"], errors="coerce").fillna(0).astype("float32"),
+        "preco_brl_foil": pd.to_numeric(df["preco_brl_foil"], errors="coerce").fillna(0).astype("float32"),
+    })
+
+    pasta = os.path.join(caminho, f"mes={data:%Y-%m}")
+    os.makedirs(pasta, exist_ok=True)
+    arquivo = os.path.join(pasta, f"{data:%Y-%m-%d}.parquet")
+    snapshot.to_parquet(arquivo, index=False)
+    return arquivo
+
+def listar_snapshots(caminho=HISTORICO_PATH) -> pd.Series:
+    # Data -> arquivo, em ordem cronológica
+    arquivos = sorted(glob(os.path.join(caminho, "mes=*", "*.parquet")))
+    datas = pd.to_datetime([os.path.splitext(os.path.basename(a))[0] for a in arquivos])
+    return pd.Series(arquivos, index=datas, dtype=object)
+
+@functools.lru_cache(maxsize=4096)
+def _totais_do_dia(arquivo, modificado_em):
+    # Cada snapshot é lido uma vez por processo, só com as colunas de quantidade e preço
+    dia = pd.read_parquet(arquivo, columns=["padrao", "foil", "preco_brl", "preco_brl_foil"])
+    valor = (dia["padrao"] * dia["preco_brl"] + dia["foil"] * dia["preco_brl_foil"]).sum()
+    return float(valor), int((dia["padrao"] + dia["foil"]).sum())
+
+def valor_ao_longo_do_tempo(caminho=HISTORICO_PATH) -> pd.DataFrame:
+    snapshots = listar_snapshots(caminho)
+    totais = [_totais_do_dia(a, os.path.getmtime(a)) for a in snapshots]
+    return pd.DataFrame(totais, index=snapshots.index, columns=["valor_total_brl", "quantidade_total"])
+
+def maiores_variacoes(dias=30, n=10, caminho=HISTORICO_PATH) -> pd.DataFrame:
+    # Compara só dois snapshots: o mais recente e o mais próximo de `dias` atrás
+    snapshots = listar_snapshots(caminho)
+    if len(snapshots) < 2:
+        return pd.DataFrame(columns=["colecao", "numero", "preco_antes", "preco_agora", "variacao", "variacao_pct"])
+
+    data_final = snapshots.index[-1]
+    anteriores = snapshots[snapshots.index <= data_final - pd.Timedelta(days=dias)]
+    arquivo_inicial = anteriores.iloc[-1] if len(anteriores) else snapshots.iloc[0]
+
+    colunas = ["colecao", "numero", "preco_brl"]
+    antes = pd.read_parquet(arquivo_inicial, columns=colunas)
+    agora = pd.read_parquet(snapshots.iloc[-1], columns=colunas)
+    comparacao = antes.merge(agora, on=["colecao", "numero"], suffixes=("_antes", "_agora"))
+    comparacao = comparacao.rename(columns={"preco_brl_antes": "preco_antes", "preco_brl_agora": "preco_agora"})
+
+    comparacao["variacao"] = comparacao["preco_agora"] - comparacao["preco_antes"]
+    comparacao["variacao_pct"] = comparacao["variacao"] / comparacao["preco_antes"].where(comparacao["preco_antes"] > 0)
+    return comparacao.loc[comparacao["variacao"].abs().nlargest(n).index]
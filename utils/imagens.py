@@ -0,0 +1,94 @@
+# Cache local de imagens das cartas: cada URL é baixada uma vez e guardada como miniatura WebP
+# no tamanho da grade. O tamanho total do cache é limitado, removendo as menos usadas (LRU por mtime).
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+from config import (
+    IMAGENS_CACHE_PATH, IMAGENS_LARGURA_MINIATURA, IMAGENS_QUALIDADE_WEBP,
+    IMAGENS_CACHE_LIMITE_MB, IMAGENS_DOWNLOADS_SIMULTANEOS, IMAGENS_TIMEOUT, IMAGENS_ESPERA_APOS_FALHA
+)
+from utils.cache_disco import limitar_pasta
+
+_sessao = None
+_lock = threading.Lock()
+# Bytes ocupados pelo cache, calculado na primeira escrita e mantido a cada gravação/remoção
+_tamanho_cache = None
+# URL -> momento da última falha; evita esperar de novo por um CDN lento a cada rerun
+_falhas = {}
+
+def _get_sessao():
+    # Sessão própria: o CDN de imagens é outro host e não divide o pool com a API
+    global _sessao
+    with _lock:
+        if _sessao is None:
+            _sessao = requests.Session()
+            _sessao.mount("https://", HTTPAdapter(pool_maxsize=IMAGENS_DOWNLOADS_SIMULTANEOS))
+            _sessao.headers.update({
+                "User-Agent": "mtg-cards-price-via-scryfall-api",
+                "Accept": "image/*"
+            })
+    return _sessao
+
+def _caminho(url):
+    return os.path.join(IMAGENS_CACHE_PATH, hashlib.sha1(url.encode()).hexdigest() + ".webp")
+
+def _gerar_miniatura(conteudo: bytes) -> bytes:
+    imagem = Image.open(BytesIO(conteudo))
+    imagem.thumbnail((IMAGENS_LARGURA_MINIATURA, IMAGENS_LARGURA_MINIATURA * 2))
+    saida = BytesIO()
+    imagem.save(saida, format="WEBP", quality=IMAGENS_QUALIDADE_WEBP)
+    return saida.getvalue()
+
+def _limitar_cache(adicionados: int):
+    # Soma o que foi gravado; a pasta só é varrida na primeira vez e quando passa do limite
+    global _tamanho_cache
+    limite = IMAGENS_CACHE_LIMITE_MB * 1024 * 1024
+    with _lock:
+        if _tamanho_cache is not None:
+            _tamanho_cache += adicionados
+        if _tamanho_cache is None or _tamanho_cache > limite:
+            _tamanho_cache = limitar_pasta(IMAGENS_CACHE_PATH, limite, ".webp")
+
+def miniatura(url):
+    # Bytes WebP da miniatura, baixando só na primeira vez; None se não há URL ou o download falhou
+    if not isinstance(url, str) or not url:
+        return None
+
+    caminho = _caminho(url)
+    try:
+        with open(caminho, "rb") as f:
+            conteudo = f.read()
+        os.utime(caminho)  # marca como usada recentemente
+        return conteudo
+    except FileNotFoundError:
+        pass
+
+    if time.monotonic() - _falhas.get(url, float("-inf")) < IMAGENS_ESPERA_APOS_FALHA:
+        return None
+    try:
+        r = _get_sessao().get(url, timeout=IMAGENS_TIMEOUT)
+        r.raise_for_status()
+        conteudo = _gerar_miniatura(r.content)
+    except Exception:
+        _falhas[url] = time.monotonic()
+        return None
+
+    os.makedirs(IMAGENS_CACHE_PATH, exist_ok=True)
+    temporario = f"{caminho}.{threading.get_ident()}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(conteudo)
+    os.replace(temporario, caminho)
+    _limitar_cache(len(conteudo))
+    return conteudo
+
+def miniaturas(urls) -> dict:
+    # Miniaturas de uma página inteira, baixando em paralelo as que ainda não estão no cache
+    urls = list(dict.fromkeys(url for url in urls if isinstance(url, str) and url))
+    with ThreadPoolExecutor(max_workers=IMAGENS_DOWNLOADS_SIMULTANEOS) as executor:
+        return dict(zip(urls, executor.map(miniatura, urls)))
@@ -0,0 +1,206 @@
+# Importação em blocos: a planilha (xlsx, csv ou lista de deck em texto) é lida aos pedaços e cada
+# bloco é buscado na Scryfall enquanto o próximo é lido. Cada bloco enriquecido é gravado logo em
+# seguida, e um arquivo de progresso permite retomar uma importação interrompida do ponto em que parou.
+# Cartas que já estão na coleção não vão para a API: entram só com as quantidades, que são somadas.
+import hashlib
+import io
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from config import IMPORTACAO_TAMANHO_BLOCO, IMPORTACAO_PROGRESSO_PATH
+from utils.api import buscar_detalhes_com_lotes
+from utils.helpers import extrair_detalhes_cartas
+
+FORMATOS = ["xlsx", "csv", "txt"]
+
+# "4 Lightning Bolt (2XM) 129", "1x Sol Ring [C21] 263 *F*"
+_LINHA_DECK = re.compile(r"^\s*(\d+)x?\s+(.+?)\s+[\(\[]([A-Za-z0-9]+)[\)\]]\s+(\S+)(\s+\*F\*)?\s*$")
+
+def ler_excel_em_blocos(arquivo, tamanho_bloco=IMPORTACAO_TAMANHO_BLOCO):
+    # Modo read_only: as linhas vêm da planilha sob demanda, sem montar a pasta inteira na memória
+    pasta = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = pasta.active.iter_rows(values_only=True)
+        cabecalho = [str(c).strip() if c is not None else "" for c in next(linhas, [])]
+        bloco = []
+        for linha in linhas:
+            bloco.append(linha)
+            if len(bloco) >= tamanho_bloco:
+                yield pd.DataFrame(bloco, columns=cabecalho)
+                bloco = []
+        if bloco:
+            yield pd.DataFrame(bloco, columns=cabecalho)
+    finally:
+        pasta.close()
+
+def ler_csv_em_blocos(arquivo, tamanho_bloco=IMPORTACAO_TAMANHO_BLOCO):
+    yield from pd.read_csv(arquivo, chunksize=tamanho_bloco, dtype={"colecao": str, "numero": str})
+
+def ler_lista_em_blocos(arquivo, tamanho_bloco=IMPORTACAO_TAMANHO_BLOCO):
+    # Lista de deck (Arena/Moxfield): linhas sem coleção e número não identificam a impressão e são ignoradas
+    bloco = []
+    for linha in io.TextIOWrapper(arquivo, encoding="utf-8-sig"):
+        encontrado = _LINHA_DECK.match(linha)
+        if not encontrado:
+            continue
+        quantidade, nome, colecao, numero, foil = encontrado.groups()
+        bloco.append({
+            "colecao": colecao, "numero": numero, "nome": nome,
+            "padrao": 0 if foil else int(quantidade), "foil": int(quantidade) if foil else 0
+        })
+        if len(bloco) >= tamanho_bloco:
+            yield pd.DataFrame(bloco)
+            bloco = []
+    if bloco:
+        yield pd.DataFrame(bloco)
+
+def ler_em_blocos(arquivo, nome_arquivo, tamanho_bloco=IMPORTACAO_TAMANHO_BLOCO):
+    extensao = os.path.splitext(nome_arquivo)[1].lower().lstrip(".")
+    leitores = {"xlsx": ler_excel_em_blocos, "csv": ler_csv_em_blocos, "txt": ler_lista_em_blocos}
+    if extensao not in leitores:
+        raise ValueError(f"Formato não suportado: {extensao}. Use {', '.join(FORMATOS)}.")
+    return leitores[extensao](arquivo, tamanho_bloco)
+
+def normalizar_bloco(bloco: pd.DataFrame) -> pd.DataFrame:
+    # Mesmas regras da importação antiga, aplicadas a cada bloco
+    bloco = bloco.dropna(subset=["colecao", "numero"]).copy()
+    bloco["colecao"] = bloco["colecao"].astype(str).str.lower()
+    bloco["numero"] = bloco["numero"].astype(str)
+    bloco["padrao"] = pd.to_numeric(bloco["padrao"], errors="coerce").fillna(0) if "padrao" in bloco else 1
+    bloco["foil"] = pd.to_numeric(bloco["foil"], errors="coerce").fillna(0) if "foil" in bloco else 0
+
+    return bloco.groupby(["colecao", "numero"], as_index=False).agg({
+        "padrao": "sum",
+        "foil": "sum",
+        **{col: "first" for col in bloco.columns if col not in ["colecao", "numero", "padrao", "foil"]}
+    })
+
+def hash_arquivo(arquivo) -> str:
+    # Identifica o arquivo para retomar a importação; lê aos pedaços e volta ao início
+    digest = hashlib.sha1()
+    for pedaco in iter(lambda: arquivo.read(1 << 20), b""):
+        digest.update(pedaco)
+    arquivo.seek(0)
+    return digest.hexdigest()
+
+def _ler_progresso(identificador):
+    try:
+        with open(IMPORTACAO_PROGRESSO_PATH, encoding="utf-8") as f:
+            progresso = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    return progresso.get("linhas", 0) if progresso.get("arquivo") == identificador else 0
+
+def _gravar_progresso(identificador, linhas):
+    temporario = IMPORTACAO_PROGRESSO_PATH + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump({"arquivo": identificador, "linhas": linhas}, f)
+    os.replace(temporario, IMPORTACAO_PROGRESSO_PATH)
+
+def ids_de_importacao(identificador, linhas, bloco: pd.DataFrame) -> list:
+    # Ids estáveis para as entradas de um bloco (arquivo, fim do bloco no arquivo, carta): importar de novo
+    # um bloco cuja gravação falhou gera as mesmas entradas, que o diário descarta como repetidas
+    return [
+        hashlib.sha1(f"{identificador}:{linhas}:{colecao}:{numero}".encode()).hexdigest()[:32]
+        for colecao, numero in zip(bloco["colecao"], bloco["numero"])
+    ]
+
+def chaves_da_colecao(df: pd.DataFrame) -> set:
+    return set(zip(df["colecao"].astype(str).str.lower(), df["numero"].astype(str)))
+
+def separar_conhecidas(bloco: pd.DataFrame, conhecidas: set):
+    # (quantidades das cartas já conhecidas, linhas novas). As novas passam a contar como conhecidas,
+    # para uma carta repetida em outro bloco não ser buscada de novo.
+    chaves = list(zip(bloco["colecao"], bloco["numero"]))
+    ja_conhecidas = np.fromiter((chave in conhecidas for chave in chaves), dtype=bool, count=len(chaves))
+    conhecidas.update(chaves)
+    return bloco.loc[ja_conhecidas, ["colecao", "numero", "padrao", "foil"]], bloco[~ja_conhecidas]
+
+def _enriquecer(bloco, cotacao, offline):
+    # Devolve (bloco enriquecido, lotes da Scryfall que falharam, cartas sem dados da Scryfall)
+    if bloco.empty:
+        return bloco, [], 0
+    lotes_falhos = []
+    identificadores = [{"set": c, "collector_number": n} for c, n in zip(bloco["colecao"], bloco["numero"])]
+    detalhes = buscar_detalhes_com_lotes(
+        identificadores, mostrar_progresso=False, offline=offline,
+        ao_falhar=lambda lote, motivo: lotes_falhos.append(f"batch of {len(lote)} card(s): {motivo}")
+    )
+    enriquecido = extrair_detalhes_cartas(bloco, detalhes, cotacao)
+    sem_dados = int(enriquecido["nome"].isna().sum())
+    if "nome" in bloco:
+        # Sem resposta da Scryfall, fica o nome que veio no arquivo (ex.: lista de deck)
+        enriquecido["nome"] = enriquecido["nome"].fillna(bloco["nome"])
+    return enriquecido, lotes_falhos, sem_dados
+
+def importar_em_blocos(blocos, cotacao, gravar, identificador=None, offline=False, ao_progredir=None, conhecidas=None):
+    # `blocos`: DataFrames brutos na ordem do arquivo. `gravar(df)` -> (sucesso, mensagem) grava um bloco
+    # enriquecido. Com `identificador`, blocos já gravados numa execução anterior são pulados e cada
+    # linha gravada leva um "id" estável, para que repetir um bloco que falhou não some duas vezes.
+    # `conhecidas`: chaves (colecao, numero) já na coleção, que não são buscadas na API.
+    # Lotes da Scryfall que falham não interrompem a importação: as cartas entram só com as quantidades
+    # (um refresh completa o resto), mas o resultado é de falha.
+    # Devolve (sucesso, mensagem, linhas importadas, linhas buscadas na API).
+    conhecidas = set() if conhecidas is None else set(conhecidas)
+    ja_feitas = _ler_progresso(identificador) if identificador else 0
+    linhas_lidas = 0
+    importadas = 0
+    buscadas = 0
+    lotes_falhos = []
+    sem_dados = 0
+
+    def proximo():
+        # Lê o próximo bloco ainda não importado: (linhas do arquivo até aqui, quantidades, linhas novas)
+        nonlocal linhas_lidas
+        for bloco in blocos:
+            inicio, linhas_lidas = linhas_lidas, linhas_lidas + len(bloco)
+            if linhas_lidas <= ja_feitas:
+                continue
+            bloco = normalizar_bloco(bloco.iloc[max(0, ja_feitas - inicio):])
+            if not bloco.empty:
+                return (linhas_lidas, *separar_conhecidas(bloco, conhecidas))
+        return None
+
+    # Um bloco em busca na API enquanto o seguinte é lido da planilha
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        atual = proximo()
+        futuro = executor.submit(_enriquecer, atual[2], cotacao, offline) if atual else None
+        while futuro is not None:
+            seguinte = proximo()
+            enriquecido, falhos, sem_dados_bloco = futuro.result()
+            lotes_falhos += falhos
+            sem_dados += sem_dados_bloco
+            futuro = executor.submit(_enriquecer, seguinte[2], cotacao, offline) if seguinte else None
+
+            gravado = pd.concat([atual[1], enriquecido], ignore_index=True)
+            if identificador:
+                gravado.insert(0, "id", ids_de_importacao(identificador, atual[0], gravado))
+            sucesso, mensagem = gravar(gravado)
+            if not sucesso:
+                if futuro is not None:
+                    futuro.cancel()
+                return False, f"{mensagem} Run the import again to resume from the last saved block.", importadas, buscadas
+            importadas += len(atual[1]) + len(enriquecido)
+            buscadas += len(enriquecido)
+            if identificador:
+                _gravar_progresso(identificador, atual[0])
+            if ao_progredir:
+                ao_progredir(atual[0], importadas)
+            atual = seguinte
+
+    if identificador and os.path.exists(IMPORTACAO_PROGRESSO_PATH):
+        os.remove(IMPORTACAO_PROGRESSO_PATH)
+    mensagem = f"{importadas} card(s) imported, {buscadas - sem_dados} fetched from Scryfall."
+    if lotes_falhos:
+        mensagem += (
+            f" {len(lotes_falhos)} Scryfall batch(es) failed (last: {lotes_falhos[-1]}), {sem_dados} card(s)"
+            " saved without details; run a refresh to fill them in."
+        )
+        return False, mensagem, importadas, buscadas
+    if sem_dados:
+        mensagem += f" {sem_dados} card(s) were not found on Scryfall."
+    return True, mensagem, importadas, buscadas
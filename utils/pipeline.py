@@ -0,0 +1,197 @@
+# Tarefas de atualização e importação sem interface: usadas pelo app e pela linha de comando,
+# para que atualizações pesadas rodem fora do servidor web (ex.: cron fora do horário de pico).
+#   python -m utils.pipeline refresh [--full | --batches N] [--offline]
+#   python -m utils.pipeline import planilha.xlsx [--offline]
+# Códigos de saída: 0 sucesso, 1 falha da tarefa, 2 argumentos inválidos.
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import time
+from config import REFRESH_IDADE_MAXIMA
+from utils.api import get_usd_to_brl
+from utils.atualizacao import atualizar_precos_incremental
+from utils.cache import limpar_cache_expirado
+from utils.historico import registrar_snapshot
+from utils.armazenamento import get_armazenamento
+from utils.colecao import carregar_colecao, salvar_colecao, adicionar_cartas, descarregar_pendentes
+from utils.importacao import ler_em_blocos, importar_em_blocos, hash_arquivo, chaves_da_colecao
+from utils.helpers import preparar_dataframe
+
+logger = logging.getLogger(__name__)
+
+SAIDA_SUCESSO = 0
+SAIDA_FALHA = 1
+SAIDA_USO = 2  # mesmo código do argparse
+
+def atualizar_colecao(armazenamento, completo=False, max_lotes=None, offline=False, ao_progredir=None, ao_falhar=None):
+    # Recarrega a coleção, busca os preços desatualizados (todos, com `completo`) e grava a cada bloco.
+    # `ao_falhar(mensagem)` é chamado a cada gravação e a cada lote da Scryfall que falha.
+    # Devolve (sucesso, mensagem, df atualizado); qualquer falha deixa `sucesso` falso.
+    df = carregar_colecao(armazenamento)
+    df = df.drop_duplicates(subset=["colecao", "numero"], keep="last")
+    df = preparar_dataframe(df)
+
+    falhas = []
+    lotes_falhos = []
+    salvo = {}
+
+    def salvar(atualizado):
+        sucesso, mensagem, final = salvar_colecao(atualizado, armazenamento, base=df)
+        if sucesso:
+            salvo["df"] = final
+        else:
+            falhas.append(mensagem)
+            logger.error("refresh gravacao_falhou mensagem=%r", mensagem)
+            if ao_falhar is not None:
+                ao_falhar(mensagem)
+
+    def falhar_lote(lote, motivo):
+        mensagem = f"Scryfall batch of {len(lote)} card(s) failed: {motivo}"
+        lotes_falhos.append(mensagem)
+        logger.error("refresh lote_falhou cartas=%d motivo=%r", len(lote), motivo)
+        if ao_falhar is not None:
+            ao_falhar(mensagem)
+
+    cotacao = get_usd_to_brl()
+    df_detalhes, sem_resposta = atualizar_precos_incremental(
+        df,
+        cotacao,
+        idade_maxima=0 if completo else REFRESH_IDADE_MAXIMA,
+        max_lotes=max_lotes,
+        salvar=salvar,
+        ao_progredir=ao_progredir,
+        offline=offline,
+        ao_falhar=falhar_lote
+    )
+    if sem_resposta:
+        logger.warning("refresh cartas_sem_resposta=%d lotes_falhos=%d", sem_resposta, len(lotes_falhos))
+
+    # O que foi gravado já inclui as alterações feitas por outros durante o refresh
+    df_detalhes = salvo.get("df", df_detalhes)
+
+    # Guarda o snapshot do dia no histórico de preços
+    registrar_snapshot(df_detalhes)
+
+    # O cache da Scryfall só é sobrescrito carta a carta; o que expirou e não foi buscado de novo sai aqui
+    try:
+        logger.info("refresh cache_expirado_removido=%d", limpar_cache_expirado())
+    except sqlite3.Error as e:
+        logger.warning("refresh limpeza_cache_falhou erro=%r", str(e))
+
+    if falhas:
+        return False, falhas[-1], df_detalhes
+    if lotes_falhos:
+        return False, f"{len(lotes_falhos)} batch(es) failed, {sem_resposta} card(s) not updated. Last error: {lotes_falhos[-1]}", df_detalhes
+    if sem_resposta:
+        return True, f"Data updated! {sem_resposta} card(s) were not found on Scryfall.", df_detalhes
+    return True, "Data updated!", df_detalhes
+
+def importar_arquivo(arquivo, nome_arquivo, armazenamento, conhecidas=None, offline=False, ao_progredir=None, ao_gravar=None):
+    # Importa uma planilha aberta em modo binário. `conhecidas`: chaves já na coleção (lidas dela se None).
+    # `ao_gravar(bloco)` recebe cada bloco gravado, para quem mantém a coleção em memória somá-lo;
+    # nada fica guardado aqui, então a memória não cresce com o tamanho do arquivo.
+    # Devolve (sucesso, mensagem, linhas gravadas).
+    if conhecidas is None:
+        conhecidas = chaves_da_colecao(carregar_colecao(armazenamento, colunas=[]))
+
+    gravadas = 0
+
+    def gravar_bloco(bloco):
+        nonlocal gravadas
+        adicionar_cartas(bloco, armazenamento)
+        sucesso, mensagem = descarregar_pendentes(armazenamento)
+        if sucesso:
+            gravadas += len(bloco)
+            if ao_gravar is not None:
+                ao_gravar(bloco.drop(columns=["id"], errors="ignore"))
+        return sucesso, mensagem
+
+    try:
+        sucesso, mensagem, *_ = importar_em_blocos(
+            ler_em_blocos(arquivo, nome_arquivo),
+            get_usd_to_brl(),
+            gravar_bloco,
+            identificador=hash_arquivo(arquivo),
+            offline=offline,
+            ao_progredir=ao_progredir,
+            conhecidas=conhecidas
+        )
+    except ValueError as e:
+        sucesso, mensagem = False, str(e)
+
+    return sucesso, mensagem, gravadas
+
+def _registrar_progresso(tarefa, *campos):
+    # Uma linha chave=valor por bloco, fácil de filtrar no log do cron
+    inicio = time.monotonic()
+
+    def ao_progredir(*valores):
+        pares = " ".join(f"{campo}={valor}" for campo, valor in zip(campos, valores))
+        logger.info("%s progresso %s decorrido_s=%.1f", tarefa, pares, time.monotonic() - inicio)
+    return ao_progredir
+
+def _argumentos(argv):
+    parser = argparse.ArgumentParser(prog="python -m utils.pipeline", description="Refresh or import the collection without the web app.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="also log debug messages")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    refresh = comandos.add_parser("refresh", help="fetch prices for stale cards and save them")
+    modo = refresh.add_mutually_exclusive_group()
+    modo.add_argument("--full", action="store_true", help="refresh every card, not only the stale ones")
+    modo.add_argument("--batches", type=int, metavar="N", help="only the N oldest batches of 75 cards")
+    refresh.add_argument("--offline", action="store_true", help="use the local bulk-data index instead of the API")
+
+    importar = comandos.add_parser("import", help="import cards from an xlsx, csv or txt decklist")
+    importar.add_argument("arquivo", metavar="FILE")
+    importar.add_argument("--offline", action="store_true", help="use the local bulk-data index instead of the API")
+
+    argumentos = parser.parse_args(argv)
+    if argumentos.comando == "refresh" and argumentos.batches is not None and argumentos.batches < 1:
+        parser.error("--batches must be at least 1")
+    return argumentos
+
+def main(argv=None) -> int:
+    argumentos = _argumentos(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if argumentos.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s %(message)s"
+    )
+
+    inicio = time.monotonic()
+    try:
+        armazenamento = get_armazenamento()
+        if argumentos.comando == "refresh":
+            logger.info("refresh inicio completo=%s lotes=%s offline=%s", argumentos.full, argumentos.batches, argumentos.offline)
+            sucesso, mensagem, df = atualizar_colecao(
+                armazenamento,
+                completo=argumentos.full,
+                max_lotes=argumentos.batches,
+                offline=argumentos.offline,
+                ao_progredir=_registrar_progresso("refresh", "feitos", "total")
+            )
+            linhas = len(df)
+        else:
+            logger.info("import inicio arquivo=%r offline=%s", argumentos.arquivo, argumentos.offline)
+            with open(argumentos.arquivo, "rb") as arquivo:
+                sucesso, mensagem, linhas = importar_arquivo(
+                    arquivo,
+                    os.path.basename(argumentos.arquivo),
+                    armazenamento,
+                    offline=argumentos.offline,
+                    ao_progredir=_registrar_progresso("import", "linhas_lidas", "importadas")
+                )
+    except Exception:
+        logger.exception("%s erro decorrido_s=%.1f", argumentos.comando, time.monotonic() - inicio)
+        return SAIDA_FALHA
+
+    nivel = logging.INFO if sucesso else logging.ERROR
+    logger.log(
+        nivel, "%s %s linhas=%d decorrido_s=%.1f mensagem=%r",
+        argumentos.comando, "fim" if sucesso else "falhou", linhas, time.monotonic() - inicio, mensagem
+    )
+    return SAIDA_SUCESSO if sucesso else SAIDA_FALHA
+
+if __name__ == "__main__":
+    sys.exit(main())
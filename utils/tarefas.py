@@ -0,0 +1,116 @@
+# Refresh em segundo plano: a tarefa roda numa thread do processo e o seu estado fica num registro
+# compartilhado por todas as sessões do Streamlit, que só o consultam (sem bloquear as outras páginas).
+# Só um refresh roda por vez; quem clica durante um refresh passa a acompanhar o que já está rodando.
+import logging
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from config import TAREFAS_HISTORICO
+from utils.pipeline import atualizar_colecao
+
+logger = logging.getLogger(__name__)
+
+EXECUTANDO = "executando"
+CONCLUIDA = "concluida"
+FALHOU = "falhou"
+
+class Tarefa:
+    def __init__(self, tipo, tamanho_lote=75):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.tamanho_lote = tamanho_lote
+        self.estado = EXECUTANDO
+        self.feitos = 0
+        self.total = None
+        self.falhas = []  # lotes da Scryfall sem resposta e gravações que falharam, na ordem
+        self.mensagem = None
+        self.resultado = None  # df atualizado, quando termina
+        self.inicio = time.monotonic()
+        self.fim = None
+
+    @property
+    def executando(self):
+        return self.estado == EXECUTANDO
+
+    @property
+    def lotes_feitos(self):
+        return math.ceil(self.feitos / self.tamanho_lote)
+
+    @property
+    def lotes_total(self):
+        return None if self.total is None else math.ceil(self.total / self.tamanho_lote)
+
+    @property
+    def fracao(self):
+        return self.feitos / self.total if self.total else 0.0
+
+    def eta(self):
+        # Segundos restantes no ritmo médio até aqui; None antes do primeiro bloco
+        if not self.executando or not self.feitos or not self.total:
+            return None
+        decorrido = time.monotonic() - self.inicio
+        return decorrido / self.feitos * (self.total - self.feitos)
+
+    def _progredir(self, feitos, total):
+        self.feitos, self.total = feitos, total
+
+    def _falhar(self, mensagem):
+        self.falhas.append(mensagem)
+
+# Uma thread de trabalho, que sobrevive a reruns e trocas de página
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tarefa")
+_lock = threading.Lock()
+_tarefas = {}  # id -> Tarefa, da mais antiga para a mais nova
+_em_execucao = {}  # tipo -> Tarefa rodando
+
+def _registrar(tarefa: Tarefa):
+    _tarefas[tarefa.id] = tarefa
+    # Guarda só as últimas tarefas terminadas
+    terminadas = [t for t in _tarefas.values() if not t.executando]
+    for antiga in terminadas[:max(0, len(terminadas) - TAREFAS_HISTORICO)]:
+        del _tarefas[antiga.id]
+
+def _executar_refresh(tarefa: Tarefa, armazenamento, completo, max_lotes, offline):
+    try:
+        sucesso, mensagem, df = atualizar_colecao(
+            armazenamento,
+            completo=completo,
+            max_lotes=max_lotes,
+            offline=offline,
+            ao_progredir=tarefa._progredir,
+            ao_falhar=tarefa._falhar
+        )
+        tarefa.resultado = df
+        tarefa.mensagem = mensagem
+        tarefa.estado = CONCLUIDA if sucesso else FALHOU
+    except Exception as e:
+        logger.exception("Refresh em segundo plano falhou")
+        tarefa._falhar(str(e))
+        tarefa.mensagem = str(e)
+        tarefa.estado = FALHOU
+    finally:
+        tarefa.fim = time.monotonic()
+        with _lock:
+            _em_execucao.pop(tarefa.tipo, None)
+
+def iniciar_refresh(armazenamento, completo=False, max_lotes=None, offline=False):
+    # Devolve (tarefa, True se foi iniciada agora); com um refresh rodando, devolve esse
+    with _lock:
+        rodando = _em_execucao.get("refresh")
+        if rodando is not None:
+            return rodando, False
+        tarefa = Tarefa("refresh")
+        _em_execucao["refresh"] = tarefa
+        _registrar(tarefa)
+    _executor.submit(_executar_refresh, tarefa, armazenamento, completo, max_lotes, offline)
+    return tarefa, True
+
+def tarefa(id_tarefa):
+    with _lock:
+        return _tarefas.get(id_tarefa)
+
+def ultima_tarefa(tipo):
+    with _lock:
+        return next((t for t in reversed(list(_tarefas.values())) if t.tipo == tipo), None)